@@ -1,41 +1,126 @@
-from openai import OpenAI, AsyncOpenAI
 import logging
 import asyncio
-from typing import Dict, Optional
+import json
+import threading
+import time
+from typing import Dict, List, Optional
 from config import Config
-from database import db
+from async_database import adb
+from cache import moderation_cache
+from preprocessor import preprocessor
+from translation_memory import translation_memory, split_segments, join_segments
+from profiling import span
+import startup
+
+try:
+    # Warm up in a real OS thread even when eventlet has patched threading
+    from eventlet.patcher import original
+    _threading = original('threading')
+except ImportError:
+    _threading = threading
 
 logger = logging.getLogger(__name__)
 
+# Seconds before retrying a failed client build, doubling up to the maximum
+_RETRY_INITIAL = 5.0
+_RETRY_MAX = 300.0
+
+_CLIENT_NAMES = ('AsyncOpenAI', 'OpenAI')
+
 class AIService:
     """OpenAI API integration for translation and moderation"""
     
     def __init__(self):
         if not Config.OPENAI_API_KEY:
             logger.warning("OpenAI API key not set. AI features will not work.")
-            self.client = None
-            self.async_client = None
-        else:
-            # Initialize OpenAI clients
-            self.client = OpenAI(api_key=Config.OPENAI_API_KEY)
-            self.async_client = AsyncOpenAI(api_key=Config.OPENAI_API_KEY)
+        # OpenAI clients are built in a background thread by warm_up() so importing
+        # this module stays cheap and no event is ever kept waiting for the SDK
+        self._clients = {}  # 'OpenAI' / 'AsyncOpenAI' -> client
+        self._client_lock = _threading.Lock()  # held while a build is running
+        self._build_failures = 0
+        self._retry_at = 0.0  # monotonic time before which a failed build is not retried
+    
+    def _build_client(self, name):
+        """Import the OpenAI SDK and build a client ('OpenAI' or 'AsyncOpenAI'); None if unavailable"""
+        if not Config.OPENAI_API_KEY:
+            return None
+        try:
+            import openai
+            return getattr(openai, name)(api_key=Config.OPENAI_API_KEY)
+        except Exception as e:
+            logger.error(f"Failed to initialize OpenAI client: {e}")
+            return None
+    
+    def _get_client(self, name):
+        """Built client, or None (AI is skipped) while it is being built or after a failed build"""
+        client = self._clients.get(name)
+        if client is None:
+            self.warm_up()
+        return client
+    
+    @property
+    def client(self):
+        """Synchronous OpenAI client"""
+        return self._get_client('OpenAI')
+    
+    @property
+    def async_client(self):
+        """Asynchronous OpenAI client"""
+        return self._get_client('AsyncOpenAI')
+    
+    def warm_up(self):
+        """Build missing clients in a background thread, unless a build is running or backing off after a failure"""
+        if not Config.OPENAI_API_KEY or time.monotonic() < self._retry_at:
+            return
+        # Never wait for the lock: the build imports the SDK and can take seconds
+        if not self._client_lock.acquire(blocking=False):
+            return
+        
+        def run():
+            try:
+                for name in _CLIENT_NAMES:
+                    if name in self._clients:
+                        continue
+                    client = self._build_client(name)
+                    if client is None:
+                        self._build_failures += 1
+                        delay = min(_RETRY_MAX, _RETRY_INITIAL * 2 ** (self._build_failures - 1))
+                        self._retry_at = time.monotonic() + delay
+                        logger.warning(f"AI features disabled; retrying the OpenAI client in {delay:.0f}s")
+                        return
+                    self._clients[name] = client
+                self._build_failures = 0
+                startup.mark('ai_ready')
+            finally:
+                self._client_lock.release()
+        
+        try:
+            _threading.Thread(target=run, name='openai-warm-up', daemon=True).start()
+        except Exception:
+            self._client_lock.release()
+            raise
     
     async def detect_language(self, text: str) -> str:
         """Detect the source language of text"""
         if not self.async_client:
             return 'en'
         
+        if not preprocessor.is_translatable(text):
+            preprocessor.record_skip('detect_language')
+            return 'en'
+        
         try:
             # Simple language detection using OpenAI
-            response = await self.async_client.chat.completions.create(
-                model=Config.OPENAI_MODEL,
-                messages=[
-                    {"role": "system", "content": "You are a language detector. Respond with only the ISO 639-1 language code (e.g., 'en', 'es', 'fr')."},
-                    {"role": "user", "content": f"Detect the language of this text and respond with only the ISO 639-1 code: {text}"}
-                ],
-                max_tokens=10,
-                temperature=0
-            )
+            with span('ai', 'detect_language'):
+                response = await self.async_client.chat.completions.create(
+                    model=Config.OPENAI_MODEL,
+                    messages=[
+                        {"role": "system", "content": "You are a language detector. Respond with only the ISO 639-1 language code (e.g., 'en', 'es', 'fr')."},
+                        {"role": "user", "content": f"Detect the language of this text and respond with only the ISO 639-1 code: {preprocessor.translatable_text(text)}"}
+                    ],
+                    max_tokens=10,
+                    temperature=0
+                )
             detected_lang = response.choices[0].message.content.strip().lower()
             return detected_lang[:2]  # Ensure it's a 2-character code
         except Exception as e:
@@ -47,10 +132,14 @@ class AIService:
         if not self.async_client:
             return text
         
+        if not preprocessor.is_translatable(text):
+            preprocessor.record_skip('translate_text')
+            return text
+        
         try:
             # Check cache first
             if source_language != 'auto':
-                cached = db.get_cached_translation(text, source_language, target_language)
+                cached = await adb.get_cached_translation(text, source_language, target_language)
                 if cached:
                     logger.info(f"Using cached translation for {text[:50]}...")
                     return cached
@@ -60,30 +149,102 @@ class AIService:
                 source_language = await self.detect_language(text)
             
             # Check cache again with detected language
-            cached = db.get_cached_translation(text, source_language, target_language)
+            cached = await adb.get_cached_translation(text, source_language, target_language)
             if cached:
                 return cached
             
-            # Translate using OpenAI
+            # Translate, reusing stored sentence translations where possible
+            translated_text = await self._translate_with_memory(text, source_language, target_language)
+            
+            # Cache the translation
+            await adb.cache_translation(text, source_language, target_language, translated_text)
+            
+            return translated_text
+        except Exception as e:
+            logger.error(f"Translation failed: {e}")
+            return text  # Return original text on failure
+    
+    async def _translate_with_memory(self, text: str, source_language: str, target_language: str) -> str:
+        """Translate text sentence by sentence, sending only segments missing from the translation memory"""
+        segments, separators = split_segments(text)
+        if len(segments) == 1:
+            return await self._translate_uncached(text, source_language, target_language)
+        
+        found = await translation_memory.lookup(segments, source_language, target_language)
+        missing = [
+            segment for segment in dict.fromkeys(segments)
+            if segment not in found and preprocessor.is_translatable(segment)
+        ]
+        if missing:
+            translated = await self._translate_segments(missing, source_language, target_language)
+            if translated is None:
+                return await self._translate_uncached(text, source_language, target_language)
+            await translation_memory.store(translated, source_language, target_language)
+            found.update(translated)
+        
+        return join_segments([found.get(segment, segment) for segment in segments], separators)
+    
+    async def _translate_segments(self, segments: List[str], source_language: str, target_language: str) -> Optional[Dict[str, str]]:
+        """Translate several segments in one request; None if the response cannot be matched up"""
+        if len(segments) == 1:
+            return {segments[0]: await self._translate_uncached(segments[0], source_language, target_language)}
+        
+        masked = [preprocessor.mask(segment) for segment in segments]
+        with span('ai', 'translate_segments'):
+            response = await self.async_client.chat.completions.create(
+                model=Config.OPENAI_MODEL,
+                messages=[
+                    {"role": "system", "content": f"You are a professional translator. Translate each string in the JSON array from {source_language} to {target_language}. Keep placeholders like [[0]] exactly as they are. Only return a JSON array of the translated strings, in the same order, nothing else."},
+                    {"role": "user", "content": json.dumps([masked_text for masked_text, _ in masked], ensure_ascii=False)}
+                ],
+                max_tokens=500,
+                temperature=0.3
+            )
+        try:
+            translated = json.loads(response.choices[0].message.content.strip())
+        except ValueError:
+            logger.warning("Segment translation returned invalid JSON, translating full text instead")
+            return None
+        if not isinstance(translated, list) or len(translated) != len(segments):
+            logger.warning("Segment translation returned mismatched segments, translating full text instead")
+            return None
+        
+        result = {}
+        for segment, (_, preserved), translated_segment in zip(segments, masked, translated):
+            restored = preprocessor.unmask(str(translated_segment), preserved)
+            if restored is None:
+                logger.warning("Segment translation dropped placeholders, translating full text instead")
+                return None
+            result[segment] = restored
+        return result
+    
+    async def _translate_uncached(self, text: str, source_language: str, target_language: str) -> str:
+        """Translate only the translatable spans of text; URLs, mentions and code are masked"""
+        masked_text, preserved = preprocessor.mask(text)
+        if preserved:
+            translated_masked = await self._complete_translation(masked_text, source_language, target_language, preserve_placeholders=True)
+            translated_text = preprocessor.unmask(translated_masked, preserved)
+            if translated_text is not None:
+                return translated_text
+            logger.warning("Translation dropped placeholders, retrying with unmasked text")
+        return await self._complete_translation(text, source_language, target_language)
+    
+    async def _complete_translation(self, text: str, source_language: str, target_language: str, preserve_placeholders: bool = False) -> str:
+        """Translate text with a single OpenAI chat completion"""
+        system_prompt = f"You are a professional translator. Translate the following text from {source_language} to {target_language}. Only return the translated text, nothing else."
+        if preserve_placeholders:
+            system_prompt += " Keep placeholders like [[0]] exactly as they are."
+        with span('ai', 'translate'):
             response = await self.async_client.chat.completions.create(
                 model=Config.OPENAI_MODEL,
                 messages=[
-                    {"role": "system", "content": f"You are a professional translator. Translate the following text from {source_language} to {target_language}. Only return the translated text, nothing else."},
+                    {"role": "system", "content": system_prompt},
                     {"role": "user", "content": text}
                 ],
                 max_tokens=500,
                 temperature=0.3
             )
-            
-            translated_text = response.choices[0].message.content.strip()
-            
-            # Cache the translation
-            db.cache_translation(text, source_language, target_language, translated_text)
-            
-            return translated_text
-        except Exception as e:
-            logger.error(f"Translation failed: {e}")
-            return text  # Return original text on failure
+        return response.choices[0].message.content.strip()
     
     async def moderate_content(self, text: str) -> Dict:
         """Check message for toxic content using OpenAI Moderation API"""
@@ -95,8 +256,22 @@ class AIService:
                 'flagged_categories': []
             }
         
+        if not preprocessor.needs_moderation(text):
+            preprocessor.record_skip('moderate_content')
+            return {
+                'is_flagged': False,
+                'toxicity_score': 0.0,
+                'categories': {},
+                'flagged_categories': []
+            }
+        
+        cached = await moderation_cache.get(text)
+        if cached is not None:
+            return cached
+        
         try:
-            response = await self.async_client.moderations.create(input=text)
+            with span('ai', 'moderate'):
+                response = await self.async_client.moderations.create(input=text)
             result = response.results[0]
             
             # Extract category scores (handling both dict and object formats)
@@ -125,6 +300,7 @@ class AIService:
                 'flagged_categories': [cat for cat, val in category_score_values.items() if val >= Config.TOXICITY_THRESHOLD]
             }
             
+            await moderation_cache.set(text, moderation_result)
             return moderation_result
         except Exception as e:
             logger.error(f"Content moderation failed: {e}")
@@ -1,17 +1,22 @@
+import startup
+import eventlet
+
+# Patch before anything else is imported; heavy SDKs (openai/httpx) are only
+# imported on first use, so they no longer need to be loaded first.
+eventlet.monkey_patch()
+
 from flask import Flask
 from flask_socketio import SocketIO
 from flask_cors import CORS
 import logging
-import eventlet
 
 from config import Config
 from routes import api
-from socket_handlers import register_socket_handlers
+from socket_handlers import register_socket_handlers, start_backpressure_sweep
 from database import db
-
-# Apply eventlet monkey patch after heavy imports (e.g., openai/httpx) to avoid
-# trio compatibility errors triggered during import.
-eventlet.monkey_patch()
+from ai_service import ai_service
+from utils import run_async
+from wire import socketio_options
 
 # Configure logging
 logging.basicConfig(
@@ -33,7 +38,8 @@ socketio = SocketIO(
     cors_allowed_origins=Config.CORS_ORIGINS,
     async_mode='eventlet',
     logger=True,
-    engineio_logger=True
+    engineio_logger=True,
+    **socketio_options()
 )
 
 # Register routes
@@ -42,23 +48,32 @@ app.register_blueprint(api, url_prefix='/api')
 # Register socket handlers
 register_socket_handlers(socketio)
 
-# Health check endpoint
+# Health check endpoints
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return {'status': 'healthy', 'service': 'realtime-chat-backend'}, 200
+    return run_async(startup.health())
+
+@app.route('/health/live', methods=['GET'])
+def liveness_check():
+    """Liveness probe"""
+    return run_async(startup.liveness())
+
+@app.route('/health/ready', methods=['GET'])
+def readiness_check():
+    """Readiness probe (503 until the first database connection attempt finishes)"""
+    return run_async(startup.readiness())
+
+startup.mark('app_ready')
 
 if __name__ == '__main__':
-    # Initialize default room
-    try:
-        rooms = db.get_rooms()
-        if not rooms:
-            db.create_room('general')
-            logger.info("Created default 'general' room")
-    except Exception as e:
-        logger.error(f"Failed to initialize default room: {e}")
+    # Connect to MongoDB in the background; the default room is created once storage is ready
+    db.connect_in_background(on_ready=startup.database_ready)
+    # Import the OpenAI SDK in the background instead of on the first message
+    ai_service.warm_up()
+    start_backpressure_sweep(socketio)
     
-    logger.info("Starting Flask-SocketIO server on port 5000...")
+    logger.info("Starting Flask-SocketIO server on port 5000 (eventlet mode)...")
     socketio.run(
         app,
         host='0.0.0.0',
@@ -0,0 +1,131 @@
+"""Native asyncio server mode.
+
+Runs the same Socket.IO handlers and REST routes as app.py, but on a single
+asyncio event loop using python-socketio's AsyncServer and aiohttp instead of
+Flask-SocketIO on eventlet. Start with ``python async_app.py``.
+"""
+import startup
+from aiohttp import web
+import socketio
+import asyncio
+import logging
+import re
+
+from config import Config
+from routes import ROUTES
+from socket_handlers import register_async_socket_handlers, start_async_backpressure_sweep, watch_room_merges
+from database import db
+from ai_service import ai_service
+from export import StreamingBody
+from wire import socketio_options
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Initialize SocketIO
+sio = socketio.AsyncServer(
+    async_mode='aiohttp',
+    cors_allowed_origins=Config.CORS_ORIGINS,
+    logger=True,
+    engineio_logger=True,
+    **socketio_options()
+)
+
+@web.middleware
+async def cors_middleware(request, handler):
+    """Allow the configured frontend origins to call the REST API"""
+    origin = request.headers.get('Origin')
+    if request.method == 'OPTIONS':
+        response = web.Response()
+    else:
+        response = await handler(request)
+    if origin in Config.CORS_ORIGINS:
+        response.headers['Access-Control-Allow-Origin'] = origin
+        response.headers['Access-Control-Allow-Credentials'] = 'true'
+        response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
+        response.headers['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
+    return response
+
+def make_view(handler):
+    """Adapt a shared route handler to an aiohttp view"""
+    async def view(request):
+        data = {}
+        if request.can_read_body:
+            try:
+                data = await request.json()
+            except ValueError:
+                data = {}
+        body, status = await handler(request.query, data or {}, **request.match_info)
+        if isinstance(body, StreamingBody):
+            return await stream(request, body, status)
+        return web.json_response(body, status=status)
+    return view
+
+async def stream(request, body, status):
+    """Send a StreamingBody chunk by chunk; the blocking chunk generator runs in a worker thread"""
+    response = web.StreamResponse(status=status, headers=body.headers())
+    response.content_type = body.content_type.split(';')[0]
+    if 'charset=' in body.content_type:
+        response.charset = body.content_type.split('charset=')[1]
+    await response.prepare(request)
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            chunk = await loop.run_in_executor(None, next, body.chunks, None)
+            if chunk is None:
+                break
+            await response.write(chunk)
+    except ConnectionResetError:
+        logger.info(f"Client disconnected during {request.path}")
+        return response
+    finally:
+        # Release the database cursor, also when the client goes away mid-stream
+        await loop.run_in_executor(None, body.chunks.close)
+    await response.write_eof()
+    return response
+
+def make_health_view(check):
+    """Adapt a startup health check to an aiohttp view"""
+    async def view(request):
+        body, status = await check()
+        return web.json_response(body, status=status)
+    return view
+
+# Initialize aiohttp app
+app = web.Application(middlewares=[cors_middleware])
+sio.attach(app)
+
+# Register routes (Flask '<param>' placeholders become aiohttp '{param}')
+for path, methods, handler in ROUTES:
+    aiohttp_path = '/api' + re.sub(r'<(?:\w+:)?(\w+)>', r'{\1}', path)
+    for method in methods:
+        app.router.add_route(method, aiohttp_path, make_view(handler))
+
+app.router.add_get('/health', make_health_view(startup.health))
+app.router.add_get('/health/live', make_health_view(startup.liveness))
+app.router.add_get('/health/ready', make_health_view(startup.readiness))
+
+# Register socket handlers
+register_async_socket_handlers(sio)
+
+async def start_background_tasks(app):
+    """Start background work that needs the running event loop"""
+    start_async_backpressure_sweep(sio)
+    watch_room_merges(sio)
+
+app.on_startup.append(start_background_tasks)
+
+startup.mark('app_ready')
+
+if __name__ == '__main__':
+    # Connect to MongoDB in the background; the default room is created once storage is ready
+    db.connect_in_background(on_ready=startup.database_ready)
+    # Import the OpenAI SDK in the background instead of on the first message
+    ai_service.warm_up()
+
+    logger.info("Starting Socket.IO server on port 5000 (asyncio mode)...")
+    web.run_app(app, host='0.0.0.0', port=5000)
@@ -0,0 +1,192 @@
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import logging
+import threading
+import time
+from typing import Dict
+import pymongo
+from config import Config
+from database import db
+from profiling import span
+
+logger = logging.getLogger(__name__)
+
+_RAISE = object()
+
+class DatabaseBusyError(Exception):
+    """Raised when the database executor queue is full"""
+
+class AsyncDatabase:
+    """Awaitable variants of the Database API, run on a bounded thread pool.
+
+    Every call runs in a worker thread under a pymongo client-side timeout and
+    an asyncio timeout, so database latency never blocks the event loop. When
+    more than DB_EXECUTOR_WORKERS + DB_EXECUTOR_QUEUE calls are pending, new
+    calls are rejected instead of queueing without bound.
+    """
+
+    def __init__(self, database):
+        self.database = database
+        self.workers = Config.DB_EXECUTOR_WORKERS
+        self.max_pending = Config.DB_EXECUTOR_WORKERS + Config.DB_EXECUTOR_QUEUE
+        self.timeout = Config.DB_CALL_TIMEOUT
+        self.executor = None  # created on first use, after eventlet monkey patching
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.running = 0
+        self.peak_pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.queue_wait_total = 0.0
+        self.call_time_total = 0.0
+
+    def _get_executor(self):
+        """Create the worker pool on first use"""
+        with self._lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='db')
+            return self.executor
+
+    def _call(self, fn, submitted_at, timeout, args, kwargs):
+        """Run a Database method in a worker thread"""
+        started = time.perf_counter()
+        with self._lock:
+            self.running += 1
+            self.queue_wait_total += started - submitted_at
+        try:
+            with pymongo.timeout(timeout):
+                return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.call_time_total += time.perf_counter() - started
+
+    async def _run(self, fn, *args, default=_RAISE, timeout=None, **kwargs):
+        """Run fn on the executor; on rejection or timeout return default (or raise)"""
+        timeout = timeout or self.timeout
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                busy = True
+            else:
+                self.pending += 1
+                self.peak_pending = max(self.peak_pending, self.pending)
+                busy = False
+        if busy:
+            logger.warning(f"Database executor saturated, rejecting {fn.__name__}")
+            if default is _RAISE:
+                raise DatabaseBusyError(f"Database busy: {fn.__name__}")
+            return default
+
+        try:
+            job = self._get_executor().submit(self._call, fn, time.perf_counter(), timeout, args, kwargs)
+        except Exception:
+            self._release()
+            raise
+        # The slot is freed when the job leaves the executor (finished, or cancelled
+        # before it started), not when the caller stops waiting for it
+        job.add_done_callback(self._release)
+        try:
+            with span('db', fn.__name__):
+                return await asyncio.wait_for(asyncio.wrap_future(job), timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            logger.warning(f"Database call {fn.__name__} timed out after {timeout}s")
+            if default is _RAISE:
+                raise
+            return default
+
+    def _release(self, job=None):
+        """Free an executor slot"""
+        with self._lock:
+            self.pending -= 1
+            self.completed += 1
+
+    async def create_user(self, username, preferred_language='en'):
+        """Awaitable Database.create_user"""
+        return await self._run(self.database.create_user, username, preferred_language)
+
+    async def get_user(self, user_id=None, username=None):
+        """Awaitable Database.get_user"""
+        return await self._run(self.database.get_user, user_id=user_id, username=username, default=None)
+
+    async def update_user_language(self, user_id, language):
+        """Awaitable Database.update_user_language"""
+        return await self._run(self.database.update_user_language, user_id, language, default=None)
+
+    async def save_message(self, message_data):
+        """Awaitable Database.save_message"""
+        return await self._run(self.database.save_message, message_data)
+
+    async def get_messages(self, room_id, limit=50, strict=False):
+        """Awaitable Database.get_messages; with strict, a rejection, timeout or MongoDB error raises instead of returning []"""
+        return await self._run(self.database.get_messages, room_id, limit, strict=strict, default=_RAISE if strict else [])
+
+    async def get_messages_since(self, room_id, message_id, limit=50):
+        """Awaitable Database.get_messages_since"""
+        return await self._run(self.database.get_messages_since, room_id, message_id, limit, default=None)
+
+    async def get_cached_translation(self, text, source_lang, target_lang):
+        """Awaitable Database.get_cached_translation"""
+        return await self._run(self.database.get_cached_translation, text, source_lang, target_lang, default=None)
+
+    async def get_cached_translations(self, texts, source_lang, target_lang):
+        """Awaitable Database.get_cached_translations"""
+        return await self._run(self.database.get_cached_translations, texts, source_lang, target_lang, default={})
+
+    async def cache_translation(self, text, source_lang, target_lang, translated_text):
+        """Awaitable Database.cache_translation"""
+        return await self._run(self.database.cache_translation, text, source_lang, target_lang, translated_text, default=None)
+
+    async def cache_translations(self, translations, source_lang, target_lang):
+        """Awaitable Database.cache_translations"""
+        return await self._run(self.database.cache_translations, translations, source_lang, target_lang, default=None)
+
+    async def get_cached_moderation(self, fingerprint, threshold, max_age=None):
+        """Awaitable Database.get_cached_moderation"""
+        return await self._run(self.database.get_cached_moderation, fingerprint, threshold, max_age, default=None)
+
+    async def cache_moderation(self, fingerprint, threshold, result):
+        """Awaitable Database.cache_moderation"""
+        return await self._run(self.database.cache_moderation, fingerprint, threshold, result, default=None)
+
+    async def create_room(self, room_name):
+        """Awaitable Database.create_room"""
+        return await self._run(self.database.create_room, room_name)
+
+    async def get_rooms(self):
+        """Awaitable Database.get_rooms"""
+        return await self._run(self.database.get_rooms, default=[])
+
+    async def get_room(self, room_id=None, room_name=None):
+        """Awaitable Database.get_room"""
+        return await self._run(self.database.get_room, room_id=room_id, room_name=room_name, default=None)
+
+    async def get_or_create_room(self, room_name):
+        """Awaitable Database.get_or_create_room"""
+        return await self._run(self.database.get_or_create_room, room_name)
+
+    def stats(self) -> Dict:
+        """Executor saturation and connection pool statistics"""
+        completed = self.completed or 1
+        return {
+            'executor': {
+                'workers': self.workers,
+                'running': self.running,
+                'pending': self.pending,
+                'max_pending': self.max_pending,
+                'peak_pending': self.peak_pending,
+                'saturation': round(self.pending / self.max_pending, 4),
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+                'avg_queue_wait_ms': round(self.queue_wait_total / completed * 1000, 2),
+                'avg_call_ms': round(self.call_time_total / completed * 1000, 2)
+            },
+            'pool': self.database.pool_stats()
+        }
+
+# Global async database instance
+adb = AsyncDatabase(db)
@@ -0,0 +1,207 @@
+import logging
+import threading
+import time
+from typing import Dict, List, Tuple
+from config import Config
+from profiling import payload_size
+
+logger = logging.getLogger(__name__)
+
+# Events that may be coalesced (latest state per user wins) for slow sockets,
+# and the key they are coalesced under
+_COALESCED_EVENTS = {
+    'user_typing': 'typing',
+    'user_joined': 'presence',
+    'user_left': 'presence',
+}
+
+class EmitPlan:
+    """What a transport should do around one room emit"""
+
+    __slots__ = ('skip', 'recipients', 'skipped', 'deliveries', 'disconnect')
+
+    def __init__(self, skip):
+        self.skip = skip  # sids to leave out of the room emit
+        self.recipients = 0
+        self.skipped = 0  # members held back because of their queue depth
+        self.deliveries = []  # (sid, event, data) to send to single sockets first
+        self.disconnect = []  # sids of persistently slow consumers
+
+class Backpressure:
+    """Per-socket outbound queue limits for room broadcasts.
+
+    Each socket's Engine.IO outbound queue depth is checked before a room
+    emit. Above OUTBOUND_SOFT_LIMIT, typing and presence events are coalesced
+    and delivered once the socket drains. Above OUTBOUND_HARD_LIMIT, messages
+    are skipped too and the socket is sent 'resync_required' when it drains
+    (the client then resumes from its last-seen message). Messages themselves
+    are never queued for later delivery: a socket that skipped any gets
+    'resync_required' for the room before it receives another message from it,
+    either just ahead of the next room emit or from sweep() if the room has
+    gone quiet. Coalesced events follow the resync notice. Sockets that stay
+    above the hard limit for SLOW_CONSUMER_TIMEOUT seconds are disconnected.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.slow_since = {}  # sid -> when it went over the hard limit
+        self.pending = {}  # sid -> {(kind, room, username): (event, data)} coalesced events
+        self.stale = {}  # sid -> rooms with skipped messages
+        self.depths = {}  # sid -> outbound queue depth at its last room emit
+        self.rooms = {}  # room_id -> [emits, deliveries, skipped, bytes, emit seconds]
+        self.max_depth = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.resyncs = 0
+        self.disconnects = 0
+
+    @staticmethod
+    def enabled() -> bool:
+        """Whether outbound limits are configured"""
+        return Config.OUTBOUND_HARD_LIMIT > 0
+
+    @staticmethod
+    def queue_depth(server, eio_sid) -> int:
+        """Packets waiting in a socket's Engine.IO outbound queue"""
+        socket = server.eio.sockets.get(eio_sid)
+        return socket.queue.qsize() if socket is not None else 0
+
+    def plan(self, server, event: str, data, room: str, skip_sid=None) -> EmitPlan:
+        """Decide which room members receive an event now"""
+        skip = set(skip_sid if isinstance(skip_sid, list) else [skip_sid] if skip_sid else [])
+        plan = EmitPlan(list(skip))
+        if not self.enabled():
+            plan.recipients = sum(1 for sid, _ in server.manager.get_participants('/', room) if sid not in skip)
+            return plan
+        kind = _COALESCED_EVENTS.get(event)
+        now = time.monotonic()
+        with self._lock:
+            for sid, eio_sid in server.manager.get_participants('/', room):
+                if sid in skip:
+                    continue
+                depth = self.queue_depth(server, eio_sid)
+                self.depths[sid] = depth
+                self.max_depth = max(self.max_depth, depth)
+
+                if depth >= Config.OUTBOUND_HARD_LIMIT:
+                    plan.skip.append(sid)
+                    plan.skipped += 1
+                    since = self.slow_since.setdefault(sid, now)
+                    if now - since >= Config.SLOW_CONSUMER_TIMEOUT:
+                        plan.disconnect.append(sid)
+                        self.disconnects += 1
+                        logger.warning(f"Disconnecting slow consumer {sid} ({depth} packets queued for {now - since:.1f}s)")
+                        self._forget(sid)
+                    elif kind:
+                        self._coalesce(sid, kind, room, event, data)
+                    else:
+                        self.stale.setdefault(sid, set()).add(room)
+                        self.dropped += 1
+                    continue
+
+                self.slow_since.pop(sid, None)
+                if depth >= Config.OUTBOUND_SOFT_LIMIT:
+                    if kind:
+                        plan.skip.append(sid)
+                        plan.skipped += 1
+                        self._coalesce(sid, kind, room, event, data)
+                    else:
+                        plan.recipients += 1
+                else:
+                    # Drained: deliver what was held back first
+                    plan.recipients += 1
+                    self._drain(sid, plan.deliveries)
+        return plan
+
+    def sweep(self, server) -> List[Tuple[str, str, object]]:
+        """(sid, event, data) held back for sockets that drained below the soft limit without a room emit since"""
+        deliveries = []
+        with self._lock:
+            for sid in set(self.pending) | set(self.stale):
+                eio_sid = server.manager.eio_sid_from_sid(sid, '/')
+                if eio_sid is None:
+                    self._forget(sid)
+                    continue
+                depth = self.queue_depth(server, eio_sid)
+                self.depths[sid] = depth
+                if depth < Config.OUTBOUND_SOFT_LIMIT:
+                    self.slow_since.pop(sid, None)
+                    self._drain(sid, deliveries)
+        return deliveries
+
+    def _drain(self, sid, deliveries):
+        """Queue a drained socket's resyncs and coalesced events for delivery; caller holds the lock"""
+        for stale_room in self.stale.pop(sid, ()):
+            deliveries.append((sid, 'resync_required', {'room_id': stale_room}))
+            self.resyncs += 1
+        for pending_event, pending_data in self.pending.pop(sid, {}).values():
+            deliveries.append((sid, pending_event, pending_data))
+
+    def _coalesce(self, sid, kind, room, event, data):
+        """Keep only the latest typing/presence event per user for a slow socket; caller holds the lock"""
+        key = (kind, room, data.get('username') if isinstance(data, dict) else None)
+        pending = self.pending.setdefault(sid, {})
+        if key in pending:
+            self.coalesced += 1
+        pending[key] = (event, data)
+
+    def _forget(self, sid):
+        """Drop state for a socket; caller holds the lock"""
+        self.slow_since.pop(sid, None)
+        self.pending.pop(sid, None)
+        self.stale.pop(sid, None)
+        self.depths.pop(sid, None)
+
+    def forget(self, sid):
+        """Drop state for a disconnected socket"""
+        with self._lock:
+            self._forget(sid)
+
+    def record_fanout(self, room: str, data, recipients: int, skipped: int, seconds: float):
+        """Account the cost of one room emit"""
+        size = payload_size(data)
+        with self._lock:
+            stats = self.rooms.get(room)
+            if stats is None:
+                stats = self.rooms[room] = [0, 0, 0, 0, 0.0]
+            stats[0] += 1
+            stats[1] += recipients
+            stats[2] += skipped
+            stats[3] += size * recipients
+            stats[4] += seconds
+
+    def stats(self, top: int = 20) -> Dict:
+        """Slow-consumer counters and the rooms with the highest fan-out"""
+        with self._lock:
+            rooms = sorted(self.rooms.items(), key=lambda item: item[1][1], reverse=True)[:top]
+            return {
+                'soft_limit': Config.OUTBOUND_SOFT_LIMIT,
+                'hard_limit': Config.OUTBOUND_HARD_LIMIT,
+                'queue_depths': {
+                    'sockets': len(self.depths),
+                    'current_max': max(self.depths.values(), default=0),
+                    'over_soft_limit': sum(1 for depth in self.depths.values() if depth >= Config.OUTBOUND_SOFT_LIMIT),
+                    'over_hard_limit': sum(1 for depth in self.depths.values() if depth >= Config.OUTBOUND_HARD_LIMIT),
+                    'peak': self.max_depth
+                },
+                'slow_sockets': len(self.slow_since),
+                'sockets_with_coalesced_events': len(self.pending),
+                'coalesced': self.coalesced,
+                'dropped_messages': self.dropped,
+                'resyncs': self.resyncs,
+                'disconnects': self.disconnects,
+                'rooms': {
+                    room: {
+                        'emits': emits,
+                        'deliveries': deliveries,
+                        'avg_fanout': round(deliveries / emits, 2),
+                        'skipped': skipped,
+                        'bytes': size,
+                        'avg_emit_ms': round(seconds / emits * 1000, 3)
+                    }
+                    for room, (emits, deliveries, skipped, size, seconds) in rooms
+                }
+            }
+
+# Global backpressure instance
+backpressure = Backpressure()
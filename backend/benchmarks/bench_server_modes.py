@@ -0,0 +1,100 @@
+"""Benchmark connection count and message throughput of a running chat server.
+
+Start the server in one mode, run this script against it, then repeat with
+the other mode and compare:
+
+    python app.py          # eventlet mode
+    python async_app.py    # asyncio mode
+
+Usage: python benchmarks/bench_server_modes.py [--url http://localhost:5000]
+       [--clients 200] [--messages 5] [--concurrency 50]
+
+Each client uses its own user_id, so keep --messages at or below
+RATE_LIMIT_MESSAGES. Set OPENAI_API_KEY to empty on the server to measure the
+server rather than the OpenAI API.
+"""
+import argparse
+import asyncio
+import time
+
+import socketio
+
+async def connect_client(url, index, room, semaphore, received):
+    """Connect one client and join the benchmark room; None on failure"""
+    async with semaphore:
+        client = socketio.AsyncClient(reconnection=False)
+        joined = asyncio.Event()
+        state = {}
+
+        @client.on('joined_room')
+        async def on_joined(data):
+            state['room_id'] = data['room_id']
+            joined.set()
+
+        @client.on('receive_message')
+        async def on_message(data):
+            received.append(time.perf_counter())
+
+        try:
+            await client.connect(url, transports=['websocket'])
+            await client.emit('join_room', {
+                'user_id': f'bench-user-{index}',
+                'username': f'bench{index}',
+                'room_id': room
+            })
+            await asyncio.wait_for(joined.wait(), timeout=30)
+        except Exception as e:
+            print(f"client {index} failed: {e}")
+            await client.disconnect()
+            return None
+        return client, state['room_id']
+
+async def run(url, count, messages, concurrency, room):
+    semaphore = asyncio.Semaphore(concurrency)
+    received = []
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*[
+        connect_client(url, i, room, semaphore, received) for i in range(count)
+    ])
+    connect_elapsed = time.perf_counter() - started
+    clients = [result for result in results if result]
+    print(f"connected:           {len(clients)}/{count} clients in {connect_elapsed:.2f}s "
+          f"({len(clients) / connect_elapsed:.1f} connections/s)")
+    if not clients:
+        return
+
+    # Every message is delivered to each member of the sender's room
+    room_sizes = {}
+    for _, room_id in clients:
+        room_sizes[room_id] = room_sizes.get(room_id, 0) + 1
+    expected = messages * sum(size * size for size in room_sizes.values())
+    started = time.perf_counter()
+    for i in range(messages):
+        await asyncio.gather(*[
+            client.emit('send_message', {'room_id': room_id, 'text': f'benchmark message {i}'})
+            for client, room_id in clients
+        ])
+    send_elapsed = time.perf_counter() - started
+
+    deadline = time.perf_counter() + 30
+    while len(received) < expected and time.perf_counter() < deadline:
+        await asyncio.sleep(0.05)
+    deliver_elapsed = (received[-1] if received else time.perf_counter()) - started
+
+    sent = len(clients) * messages
+    print(f"messages sent:       {sent} in {send_elapsed:.2f}s ({sent / send_elapsed:.1f} msg/s)")
+    print(f"messages delivered:  {len(received)}/{expected} in {deliver_elapsed:.2f}s "
+          f"({len(received) / deliver_elapsed:.1f} deliveries/s)")
+
+    await asyncio.gather(*[client.disconnect() for client, _ in clients])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--messages', type=int, default=5)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--room', default='general')
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.clients, args.messages, args.concurrency, args.room))
@@ -0,0 +1,130 @@
+"""Benchmark session/presence state memory per connection and lookup time.
+
+Builds the state for N connected sockets spread over users (some with several
+tabs) and rooms, once as the previous dict-per-socket representation (a list of
+rooms per socket plus room -> sid sets) and once in the SessionStore, and
+reports bytes per connection (tracemalloc) and the time of the per-event
+lookups: room membership checks and a room's preferred languages.
+
+Usage: python benchmarks/bench_session_memory.py [--connections 50000] [--rooms 500] [--rooms-per-socket 3]
+"""
+import argparse
+import gc
+import os
+import random
+import secrets
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from session_store import SessionStore  # noqa: E402
+
+LANGUAGES = ['en', 'es', 'fr', 'de', 'ja', 'zh', 'hi', 'ar']
+
+def make_connections(count, rooms, rooms_per_socket, seed=7):
+    """(sid, user_id, username, language, [room ids]) per socket, as encoded event payloads"""
+    rng = random.Random(seed)
+    room_ids = [f"{rng.getrandbits(96):024x}" for _ in range(rooms)]
+    users = max(1, int(count / 1.3))  # roughly a quarter of users with a second tab
+    connections = []
+    for i in range(count):
+        user = rng.randrange(users)
+        connections.append((
+            secrets.token_urlsafe(15),
+            f"{user:024x}".encode(),
+            f"user{user}".encode(),
+            rng.choice(LANGUAGES).encode(),
+            [room.encode() for room in rng.sample(room_ids, rooms_per_socket)]
+        ))
+    return connections, room_ids
+
+def decoded(connections):
+    """Connections with fresh strings per event, the way handlers receive them"""
+    for sid, user_id, username, language, rooms in connections:
+        for room_id in rooms:
+            yield sid, user_id.decode(), username.decode(), language.decode(), room_id.decode()
+
+def build_dicts(connections):
+    """The previous representation: active_users and room_users"""
+    active_users = {}
+    room_users = {}
+    for sid, user_id, username, language, room_id in decoded(connections):
+        if sid not in active_users:
+            active_users[sid] = {'user_id': user_id, 'username': username, 'preferred_language': language, 'rooms': []}
+        else:
+            active_users[sid]['preferred_language'] = language
+        if room_id not in active_users[sid]['rooms']:
+            active_users[sid]['rooms'].append(room_id)
+        room_users.setdefault(room_id, set()).add(sid)
+    return active_users, room_users
+
+def build_store(connections):
+    """The SessionStore representation"""
+    store = SessionStore(token_limit=0)
+    for sid, user_id, username, language, room_id in decoded(connections):
+        store.attach(sid, user_id, username, language)
+        store.join(sid, room_id)
+    return store
+
+def measure(build, connections):
+    """(state, bytes allocated while building it)"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    state = build(connections)
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return state, after - before
+
+def time_lookups(membership, languages, connections, room_ids, iterations):
+    """Average microseconds per membership check and per room language lookup"""
+    checks = [(sid, rooms[-1].decode()) for sid, _, _, _, rooms in connections]
+    start = time.perf_counter()
+    for i in range(iterations):
+        sid, room_id = checks[i % len(checks)]
+        membership(sid, room_id)
+    check_us = (time.perf_counter() - start) / iterations * 1e6
+
+    rounds = max(1, iterations // 100)
+    start = time.perf_counter()
+    for i in range(rounds):
+        languages(room_ids[i % len(room_ids)])
+    languages_us = (time.perf_counter() - start) / rounds * 1e6
+    return check_us, languages_us
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--connections', type=int, default=50000)
+    parser.add_argument('--rooms', type=int, default=500)
+    parser.add_argument('--rooms-per-socket', type=int, default=3)
+    parser.add_argument('--iterations', type=int, default=200000)
+    args = parser.parse_args()
+
+    connections, room_ids = make_connections(args.connections, args.rooms, args.rooms_per_socket)
+    print(f"{args.connections} connections, {args.rooms} rooms, {args.rooms_per_socket} rooms per socket\n")
+
+    (active_users, room_users), dict_bytes = measure(build_dicts, connections)
+    store, store_bytes = measure(build_store, connections)
+
+    def dict_languages(room_id):
+        return {active_users[sid].get('preferred_language', 'en') for sid in room_users.get(room_id, set()) if sid in active_users}
+
+    dict_times = time_lookups(
+        lambda sid, room_id: room_id in active_users.get(sid, {}).get('rooms', []),
+        dict_languages, connections, room_ids, args.iterations
+    )
+    store_times = time_lookups(store.in_room, store.room_languages, connections, room_ids, args.iterations)
+
+    print(f"{'representation':<16}{'bytes/conn':>12}{'total MB':>10}{'in_room us':>12}{'languages us':>14}")
+    for name, size, (check_us, languages_us) in (
+        ('dict + list', dict_bytes, dict_times),
+        ('SessionStore', store_bytes, store_times),
+    ):
+        print(f"{name:<16}{size / args.connections:>12.0f}{size / 1e6:>10.1f}{check_us:>12.3f}{languages_us:>14.1f}")
+    print(f"\nSessionStore also indexes {len(store.user_sockets)} users -> sockets")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Benchmark translation cache hit rate and tokens saved on a synthetic chat log.
+
+Compares the exact full-text cache against the sentence-segment translation
+memory. Chat messages are built from a Zipf-distributed pool of common chat
+sentences mixed with unique sentences, which is how real rooms repeat greetings,
+acknowledgements and copy-pasted content.
+
+Usage: python benchmarks/bench_translation_memory.py [--messages 50000] [--seed 7]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from translation_memory import TranslationMemory, split_segments, estimate_tokens  # noqa: E402
+
+COMMON_SENTENCES = [
+    "Hi everyone!", "Good morning.", "Thanks!", "Thank you so much.", "See you tomorrow.",
+    "Sounds good.", "I agree.", "What do you think?", "Can you share the link?",
+    "Let me check.", "I'll be there in five minutes.", "Sorry, I'm late.", "No worries.",
+    "Has anyone seen the latest update?", "The build is broken again.", "Did you get my email?",
+    "Great job on the release.", "Let's meet after lunch.", "How was your weekend?",
+    "I'm working from home today.", "Please review my pull request.", "Happy birthday!",
+    "Welcome to the team.", "Is the meeting still on?", "I'll send the notes later.",
+    "That makes sense.", "Could you explain that again?", "The server is down.",
+    "It works on my machine.", "Have a nice evening.",
+]
+WORDS = (
+    "project deadline customer report server update budget design team review release "
+    "feature meeting schedule question issue problem solution idea plan result data "
+    "market office travel weather coffee lunch weekend holiday family music movie"
+).split()
+
+def unique_sentence(rng):
+    """A sentence unlikely to repeat"""
+    words = rng.sample(WORDS, rng.randint(5, 12))
+    return ' '.join(words).capitalize() + rng.choice(['.', '?', '!'])
+
+def chat_log(count, rng):
+    """Synthetic chat messages of one to four sentences"""
+    weights = [1 / (rank + 1) for rank in range(len(COMMON_SENTENCES))]
+    for _ in range(count):
+        sentences = []
+        for _ in range(rng.choices([1, 2, 3, 4], weights=[50, 30, 15, 5])[0]):
+            if rng.random() < 0.6:
+                sentences.append(rng.choices(COMMON_SENTENCES, weights=weights)[0])
+            else:
+                sentences.append(unique_sentence(rng))
+        yield ' '.join(sentences)
+
+async def run(count, seed):
+    rng = random.Random(seed)
+    messages = list(chat_log(count, rng))
+    total_tokens = sum(estimate_tokens(m) for m in messages)
+
+    # Exact full-text cache (current behaviour)
+    exact_cache = set()
+    exact_hits = 0
+    exact_tokens_sent = 0
+    for message in messages:
+        if message in exact_cache:
+            exact_hits += 1
+        else:
+            exact_cache.add(message)
+            exact_tokens_sent += estimate_tokens(message)
+
+    # Sentence-segment translation memory
+    memory = TranslationMemory(persistent=False)
+    memory_tokens_sent = 0
+    full_hits = 0
+    started = time.perf_counter()
+    for message in messages:
+        segments, _ = split_segments(message)
+        found = await memory.lookup(segments, 'en', 'es')
+        missing = [s for s in dict.fromkeys(segments) if s not in found]
+        if not missing:
+            full_hits += 1
+        memory_tokens_sent += sum(estimate_tokens(s) for s in missing)
+        await memory.store({s: s for s in missing}, 'en', 'es')
+    elapsed = time.perf_counter() - started
+    stats = memory.stats()
+
+    print(f"messages:                    {count}")
+    print(f"source tokens (estimated):   {total_tokens}")
+    print("exact full-text cache:")
+    print(f"  message hit rate:          {exact_hits / count:.2%}")
+    print(f"  tokens sent to model:      {exact_tokens_sent}")
+    print("segment translation memory:")
+    print(f"  message hit rate:          {full_hits / count:.2%}")
+    print(f"  segment hit rate:          {stats['hit_rate']:.2%}")
+    print(f"  tokens sent to model:      {memory_tokens_sent}")
+    print(f"  tokens saved vs exact:     {exact_tokens_sent - memory_tokens_sent} "
+          f"({1 - memory_tokens_sent / exact_tokens_sent:.2%})")
+    print(f"  lookup+store time:         {elapsed / count * 1e6:.1f} us/message")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=50000)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    asyncio.run(run(args.messages, args.seed))
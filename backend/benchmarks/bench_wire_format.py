@@ -0,0 +1,78 @@
+"""Benchmark receive_message payload size and encode time per wire format.
+
+Encodes a realistic receive_message payload the way the Socket.IO server puts
+it on the wire (JSON vs MessagePack serializer, full vs compact field names)
+and reports bytes per message, bytes after deflate (as permessage-deflate or
+HTTP compression would send it) and encode time.
+
+Usage: python benchmarks/bench_wire_format.py [--languages 4] [--iterations 20000]
+"""
+import argparse
+import os
+import sys
+import time
+import zlib
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from socketio import packet, msgpack_packet  # noqa: E402
+from wire import encode_message  # noqa: E402
+
+TRANSLATIONS = {
+    'en': "Has anyone seen the latest update? The build is broken again on my machine.",
+    'es': "¿Alguien ha visto la última actualización? La compilación está rota otra vez en mi máquina.",
+    'fr': "Quelqu'un a-t-il vu la dernière mise à jour ? La compilation est encore cassée sur ma machine.",
+    'de': "Hat jemand das neueste Update gesehen? Der Build ist auf meinem Rechner wieder kaputt.",
+    'ja': "最新のアップデートを見た人はいますか？私のマシンでまたビルドが壊れています。",
+    'zh': "有人看到最新的更新了吗？我的机器上构建又坏了。",
+    'hi': "क्या किसी ने नवीनतम अपडेट देखा? मेरी मशीन पर बिल्ड फिर से टूट गया है।",
+    'ar': "هل رأى أحد التحديث الأخير؟ البناء معطل مرة أخرى على جهازي.",
+}
+
+def sample_message(languages):
+    """A receive_message payload as built by handle_send_message"""
+    return {
+        'message_id': '65a1f0c2e4b0a1b2c3d4e5f6',
+        'user_id': '65a1f0b9e4b0a1b2c3d4e5f0',
+        'username': 'alice',
+        'room_id': '65a1ef00e4b0a1b2c3d4e500',
+        'original_text': TRANSLATIONS['en'],
+        'timestamp': datetime.utcnow().isoformat(),
+        'is_flagged': False,
+        'toxicity_score': 0.00012874603271484375,
+        'flagged_categories': [],
+        'translations': dict(list(TRANSLATIONS.items())[:languages]),
+        'source_language': 'en',
+    }
+
+def measure(label, packet_class, payload_fn, message, iterations, baseline=None):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        encoded = packet_class(packet.EVENT, data=['receive_message', payload_fn(message)]).encode()
+    elapsed = time.perf_counter() - started
+    if isinstance(encoded, str):
+        encoded = encoded.encode('utf-8')
+    deflated = zlib.compress(encoded)
+    ratio = f"{len(encoded) / baseline:>9.0%}" if baseline else f"{'100%':>9}"
+    print(f"{label:<20} {len(encoded):>6} B {len(deflated):>8} B {elapsed / iterations * 1e6:>8.1f} us {ratio}")
+    return len(encoded)
+
+def run(languages, iterations):
+    message = sample_message(languages)
+    print(f"receive_message with {languages} translations, {iterations} iterations")
+    print(f"{'format':<20} {'bytes':>8} {'deflated':>10} {'encode':>11} {'of json':>9}")
+    baseline = measure('json', packet.Packet, lambda m: m, message, iterations)
+    for label, packet_class, payload_fn in (
+        ('compact (json)', packet.Packet, encode_message),
+        ('msgpack', msgpack_packet.MsgPackPacket, lambda m: m),
+        ('compact (msgpack)', msgpack_packet.MsgPackPacket, encode_message),
+    ):
+        measure(label, packet_class, payload_fn, message, iterations, baseline)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--languages', type=int, default=4)
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+    run(args.languages, args.iterations)
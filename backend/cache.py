@@ -0,0 +1,149 @@
+from collections import OrderedDict
+import copy
+import hashlib
+import logging
+import re
+import threading
+import time
+from typing import Any, Dict, Optional
+from config import Config
+from async_database import adb
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_REPEATED_CHAR_RE = re.compile(r'(.)\1{2,}', re.DOTALL)
+
+def normalize_text(text: str) -> str:
+    """Normalize text so trivially varied messages compare equal"""
+    text = text.casefold()
+    text = _WHITESPACE_RE.sub(' ', text).strip()
+    # Squash runs of 3+ identical characters to two ("soooo" -> "soo", "!!!!" -> "!!")
+    return _REPEATED_CHAR_RE.sub(r'\1\1', text)
+
+def fingerprint(text: str) -> str:
+    """Stable fingerprint of the normalized text"""
+    return hashlib.sha1(normalize_text(text).encode('utf-8')).hexdigest()
+
+class LRUCache:
+    """Thread-safe in-memory LRU cache with per-entry TTL and hit statistics"""
+
+    def __init__(self, max_size: int, ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key) -> Optional[Any]:
+        """Get a value, refreshing its recency; None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """Store a value, evicting the least recently used entry when full"""
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop all entries (statistics are kept)"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> Dict:
+        """Size and hit-rate statistics"""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+class ModerationCache:
+    """Two-level (memory LRU + optional MongoDB) cache of moderation verdicts"""
+
+    def __init__(self):
+        self.memory = LRUCache(Config.MODERATION_CACHE_SIZE, Config.MODERATION_CACHE_TTL)
+        self.persistent = Config.MODERATION_CACHE_PERSIST
+        self.threshold = Config.TOXICITY_THRESHOLD
+        self.persistent_hits = 0
+        self.persistent_misses = 0
+
+    def _check_threshold(self):
+        """Invalidate the memory level when the toxicity threshold changes"""
+        if Config.TOXICITY_THRESHOLD != self.threshold:
+            logger.info(
+                f"Toxicity threshold changed ({self.threshold} -> {Config.TOXICITY_THRESHOLD}), "
+                f"invalidating moderation cache"
+            )
+            self.memory.clear()
+            self.threshold = Config.TOXICITY_THRESHOLD
+
+    async def get(self, text: str) -> Optional[Dict]:
+        """Get a copy of the cached moderation verdict for text"""
+        self._check_threshold()
+        key = fingerprint(text)
+        result = self.memory.get(key)
+        if result is not None:
+            return copy.deepcopy(result)
+        if not self.persistent:
+            return None
+        result = await adb.get_cached_moderation(key, self.threshold, Config.MODERATION_CACHE_TTL)
+        if result is None:
+            self.persistent_misses += 1
+            return None
+        self.persistent_hits += 1
+        self.memory.set(key, result)
+        return copy.deepcopy(result)
+
+    async def set(self, text: str, result: Dict):
+        """Cache a moderation verdict for text"""
+        self._check_threshold()
+        key = fingerprint(text)
+        self.memory.set(key, copy.deepcopy(result))
+        if self.persistent:
+            await adb.cache_moderation(key, self.threshold, result)
+
+    def stats(self) -> Dict:
+        """Hit-rate statistics for both cache levels"""
+        lookups = self.memory.hits + self.memory.misses
+        stats = {
+            'memory': self.memory.stats(),
+            'threshold': self.threshold,
+            'hit_rate': round((self.memory.hits + self.persistent_hits) / lookups, 4) if lookups else 0.0
+        }
+        if self.persistent:
+            persistent_lookups = self.persistent_hits + self.persistent_misses
+            stats['persistent'] = {
+                'hits': self.persistent_hits,
+                'misses': self.persistent_misses,
+                'hit_rate': round(self.persistent_hits / persistent_lookups, 4) if persistent_lookups else 0.0
+            }
+        return stats
+
+# Global moderation cache instance
+moderation_cache = ModerationCache()
@@ -8,6 +8,25 @@ class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
     MONGODB_URI = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/')
     DATABASE_NAME = os.getenv('DATABASE_NAME', 'realtime_chat')
+    
+    # MongoDB connection pool settings
+    MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', '50'))
+    MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', '0'))
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', '2000'))
+    MONGO_CONNECT_TIMEOUT_MS = int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', '5000'))
+    MONGO_SOCKET_TIMEOUT_MS = int(os.getenv('MONGO_SOCKET_TIMEOUT_MS', '10000'))
+    DB_RECONNECT_INTERVAL = float(os.getenv('DB_RECONNECT_INTERVAL', '10'))  # seconds between retries
+    
+    # Local storage used while MongoDB is unavailable (empty path disables it)
+    LOCAL_STORE_PATH = os.getenv('LOCAL_STORE_PATH', 'chat_local.db')
+    LOCAL_STORE_BATCH_SIZE = int(os.getenv('LOCAL_STORE_BATCH_SIZE', '500'))
+    LOCAL_STORE_FLUSH_INTERVAL = float(os.getenv('LOCAL_STORE_FLUSH_INTERVAL', '0.5'))  # seconds
+    LOCAL_STORE_REPLAY = os.getenv('LOCAL_STORE_REPLAY', 'true').lower() == 'true'
+    
+    # Database executor settings (async data access)
+    DB_EXECUTOR_WORKERS = int(os.getenv('DB_EXECUTOR_WORKERS', '16'))
+    DB_EXECUTOR_QUEUE = int(os.getenv('DB_EXECUTOR_QUEUE', '256'))  # pending calls beyond the workers
+    DB_CALL_TIMEOUT = float(os.getenv('DB_CALL_TIMEOUT', '5'))  # seconds
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
     FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:3000')
     
@@ -19,6 +38,46 @@ class Config:
     OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-3.5-turbo')
     TOXICITY_THRESHOLD = float(os.getenv('TOXICITY_THRESHOLD', '0.7'))
     
+    # Moderation cache settings
+    MODERATION_CACHE_SIZE = int(os.getenv('MODERATION_CACHE_SIZE', '10000'))
+    MODERATION_CACHE_TTL = int(os.getenv('MODERATION_CACHE_TTL', '86400'))  # seconds
+    MODERATION_CACHE_PERSIST = os.getenv('MODERATION_CACHE_PERSIST', 'true').lower() == 'true'
+    
+    # Translation memory settings
+    TRANSLATION_MEMORY_SIZE = int(os.getenv('TRANSLATION_MEMORY_SIZE', '100000'))  # in-memory segments
+    
+    # Reconnect resume settings
+    MESSAGE_LOG_SIZE = int(os.getenv('MESSAGE_LOG_SIZE', '200'))  # recent messages kept per room
+    RESUME_MAX_MESSAGES = int(os.getenv('RESUME_MAX_MESSAGES', '200'))  # replayed per room before resetting history
+    PRESENCE_GRACE_PERIOD = float(os.getenv('PRESENCE_GRACE_PERIOD', '10'))  # seconds before user_left after a disconnect
+    
+    # Message search settings
+    SEARCH_INDEX_MAX_MESSAGES = int(os.getenv('SEARCH_INDEX_MAX_MESSAGES', '5000'))  # indexed messages per room
+    SEARCH_INDEX_QUEUE_SIZE = int(os.getenv('SEARCH_INDEX_QUEUE_SIZE', '10000'))  # messages waiting to be indexed
+    
+    # Profiling settings
+    PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'false').lower() == 'true'  # exposes /api/profiling
+    PROFILE_HANDLERS = os.getenv('PROFILE_HANDLERS', 'false').lower() == 'true'  # trace handlers from startup
+    SLOW_EVENT_THRESHOLD_MS = float(os.getenv('SLOW_EVENT_THRESHOLD_MS', '1000'))
+    PROFILER_SAMPLE_INTERVAL_MS = float(os.getenv('PROFILER_SAMPLE_INTERVAL_MS', '10'))
+    
+    # Outbound backpressure (Engine.IO packets queued per socket; 0 disables)
+    OUTBOUND_SOFT_LIMIT = int(os.getenv('OUTBOUND_SOFT_LIMIT', '32'))  # coalesce typing/presence above this
+    OUTBOUND_HARD_LIMIT = int(os.getenv('OUTBOUND_HARD_LIMIT', '256'))  # skip messages above this
+    SLOW_CONSUMER_TIMEOUT = float(os.getenv('SLOW_CONSUMER_TIMEOUT', '30'))  # seconds over the hard limit before disconnecting
+    OUTBOUND_SWEEP_INTERVAL = float(os.getenv('OUTBOUND_SWEEP_INTERVAL', '2'))  # seconds between checks for drained sockets
+    
+    # Export settings
+    EXPORT_ENABLED = os.getenv('EXPORT_ENABLED', 'false').lower() == 'true'  # exposes /api/messages/<room_id>/export
+    EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '1000'))  # messages fetched per database round trip
+    
+    # Session settings
+    SESSION_TOKEN_LIMIT = int(os.getenv('SESSION_TOKEN_LIMIT', '100000'))  # login tokens remembered for tying sockets to users
+    
+    # Socket.IO wire format: 'json', 'compact' or 'msgpack'
+    WIRE_FORMAT = os.getenv('WIRE_FORMAT', 'json').lower()
+    COMPRESSION_THRESHOLD = int(os.getenv('COMPRESSION_THRESHOLD', '1024'))  # bytes
+    
     # CORS settings
     CORS_ORIGINS = [FRONTEND_URL, 'http://localhost:5173']  # Vite default port
 
@@ -1,11 +1,86 @@
-from pymongo import MongoClient
-from datetime import datetime
+from pymongo import MongoClient, HASHED, ReturnDocument, UpdateOne, monitoring
+from pymongo.errors import AutoReconnect, BulkWriteError, OperationFailure
+from datetime import datetime, timedelta
 from bson import ObjectId
+import hashlib
 import logging
+import threading
+import time
 from config import Config
+from local_store import LocalStore
 
 logger = logging.getLogger(__name__)
 
+# Message document fields other than translations
+_MESSAGE_FIELDS = ('message_id', 'user_id', 'username', 'room_id', 'original_text', 'timestamp', 'is_flagged', 'toxicity_score')
+
+def room_id_for(room_name):
+    """Room id derived from the unique room name, so rooms created during an outage match MongoDB"""
+    return hashlib.sha1(f"room:{room_name}".encode('utf-8')).hexdigest()[:24]
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Connection pool listener tracking checkouts for saturation metrics"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.open_connections = 0
+        self.checked_out = 0
+        self.peak_checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+    
+    def pool_created(self, event):
+        pass
+    
+    def pool_ready(self, event):
+        pass
+    
+    def pool_cleared(self, event):
+        pass
+    
+    def pool_closed(self, event):
+        pass
+    
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+    
+    def connection_ready(self, event):
+        pass
+    
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections -= 1
+    
+    def connection_check_out_started(self, event):
+        pass
+    
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures += 1
+    
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+    
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+    
+    def stats(self):
+        """Pool usage statistics"""
+        return {
+            'max_pool_size': Config.MONGO_MAX_POOL_SIZE,
+            'open_connections': self.open_connections,
+            'checked_out': self.checked_out,
+            'peak_checked_out': self.peak_checked_out,
+            'saturation': round(self.checked_out / Config.MONGO_MAX_POOL_SIZE, 4),
+            'checkouts': self.checkouts,
+            'checkout_failures': self.checkout_failures
+        }
+
 class Database:
     """MongoDB database operations"""
     
@@ -16,21 +91,146 @@ class Database:
         self.messages = None
         self.rooms = None
         self.translations = None
+        self.moderations = None
         self.connected = False
+        self.pool_monitor = PoolMonitor()
+        # Embedded fallback storage while MongoDB is unavailable
+        self.local = LocalStore(Config.LOCAL_STORE_PATH) if Config.LOCAL_STORE_PATH else None
+        # Readiness: 'pending' -> 'connecting' -> 'connected' or 'unavailable' (retrying in background)
+        self.status = 'pending'
+        self.last_error = None
+        self._connect_lock = threading.Lock()
+        self._connector = None
+        # Set when a connection-class error is seen mid-run, waking the background connector
+        self._disconnected = threading.Event()
+        # Local room id -> id of the MongoDB room with the same name it was merged into on replay
+        self.room_aliases = {}
+        # Called with newly merged {local room id: MongoDB room id} so live state can follow
+        self.on_rooms_merged = None
+    
+    @property
+    def ready(self):
+        """Whether the first connection attempt has finished (connected or serving from fallback storage)"""
+        return self.status in ('connected', 'unavailable')
+    
+    def connect(self, replay: bool = True):
+        """Connect to MongoDB and ping it; returns True on success.
+        
+        With replay=False the local store is not replayed into MongoDB (read-only tools).
+        """
+        with self._connect_lock:
+            if self.connected:
+                return True
+            if self.status == 'pending':
+                self.status = 'connecting'
+            try:
+                if self.client is None:
+                    self.client = MongoClient(
+                        Config.MONGODB_URI,
+                        serverSelectionTimeoutMS=5000,
+                        maxPoolSize=Config.MONGO_MAX_POOL_SIZE,
+                        minPoolSize=Config.MONGO_MIN_POOL_SIZE,
+                        waitQueueTimeoutMS=Config.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+                        connectTimeoutMS=Config.MONGO_CONNECT_TIMEOUT_MS,
+                        socketTimeoutMS=Config.MONGO_SOCKET_TIMEOUT_MS,
+                        event_listeners=[self.pool_monitor]
+                    )
+                    self.db = self.client[Config.DATABASE_NAME]
+                # Test connection
+                self.client.admin.command('ping')
+                self.users = self.db.users
+                self.messages = self.db.messages
+                self.messages.create_index([('room_id', 1), ('timestamp', 1)])
+                self.messages.create_index('message_id')
+                self.rooms = self.db.rooms
+                self.translations = self.db.translations  # Cache for translations
+                self.translations.create_index([('cache_key', HASHED)])
+                self.moderations = self.db.moderations  # Cache for moderation verdicts
+                self.moderations.create_index([('fingerprint', 1), ('threshold', 1)])
+                self._ensure_moderation_ttl()
+                try:
+                    self.rooms.create_index('room_name', unique=True)
+                except Exception as e:
+                    logger.warning(f"Could not create unique room_name index (duplicate rooms?): {e}")
+                self.connected = True
+                self.status = 'connected'
+                self.last_error = None
+                logger.info("Connected to MongoDB successfully")
+            except Exception as e:
+                if self.status != 'unavailable':
+                    mode = 'local storage' if self.local else 'memory-only'
+                    logger.warning(f"MongoDB not available: {e}. Running in {mode} mode.")
+                self.connected = False
+                self.status = 'unavailable'
+                self.last_error = str(e)
+                return False
+        if replay:
+            moved = self.replay_local_store()
+            if moved and self.on_rooms_merged:
+                try:
+                    self.on_rooms_merged(moved)
+                except Exception as e:
+                    logger.error(f"Failed to move live state to merged rooms: {e}")
+        return True
+    
+    def _ensure_moderation_ttl(self):
+        """Let MongoDB delete moderation verdicts older than MODERATION_CACHE_TTL"""
+        if not Config.MODERATION_CACHE_TTL:
+            return
         try:
-            self.client = MongoClient(Config.MONGODB_URI, serverSelectionTimeoutMS=5000)
-            self.db = self.client[Config.DATABASE_NAME]
-            # Test connection
-            self.client.admin.command('ping')
-            self.users = self.db.users
-            self.messages = self.db.messages
-            self.rooms = self.db.rooms
-            self.translations = self.db.translations  # Cache for translations
-            self.connected = True
-            logger.info("Connected to MongoDB successfully")
-        except Exception as e:
-            logger.warning(f"MongoDB not available: {e}. Running in memory-only mode.")
-            self.connected = False
+            self.moderations.create_index('cached_at', expireAfterSeconds=Config.MODERATION_CACHE_TTL)
+        except OperationFailure:
+            # The index exists with a different TTL (the setting changed); update it in place
+            try:
+                self.db.command('collMod', 'moderations', index={
+                    'keyPattern': {'cached_at': 1},
+                    'expireAfterSeconds': Config.MODERATION_CACHE_TTL
+                })
+            except Exception as e:
+                logger.warning(f"Could not update moderation cache TTL index: {e}")
+    
+    def connect_in_background(self, on_ready=None):
+        """Connect (and keep retrying) in a background thread so startup never waits on MongoDB.
+        
+        The thread stays up after connecting and reconnects (replaying the local
+        store) whenever the connection is lost mid-run. on_ready is called once,
+        after the first attempt finishes, and again on each later successful reconnect.
+        """
+        if self._connector is not None:
+            return
+        
+        def run():
+            self.connect()
+            if on_ready:
+                on_ready()
+            while True:
+                if self.connected:
+                    self._disconnected.wait()
+                self._disconnected.clear()
+                time.sleep(Config.DB_RECONNECT_INTERVAL)
+                if self.connect() and on_ready:
+                    on_ready()
+        
+        self._connector = threading.Thread(target=run, name='mongo-connector', daemon=True)
+        self._connector.start()
+    
+    def _connection_lost(self, error):
+        """Switch to the local store after a connection-class MongoDB error; returns True if error was one.
+        
+        Only AutoReconnect (server selection and network errors) counts: a pool
+        wait-queue timeout means MongoDB is busy, not gone.
+        """
+        if not isinstance(error, AutoReconnect):
+            return False
+        with self._connect_lock:
+            if self.connected:
+                self.connected = False
+                self.status = 'unavailable'
+                self.last_error = str(error)
+                mode = 'local storage' if self.local else 'memory-only'
+                logger.warning(f"Lost connection to MongoDB: {error}. Running in {mode} mode until it reconnects.")
+        self._disconnected.set()
+        return True
     
     def create_user(self, username, preferred_language='en'):
         """Create a new user"""
@@ -46,6 +246,12 @@ class Database:
                 logger.info(f"Created user: {username}")
             except Exception as e:
                 logger.warning(f"Failed to save user to MongoDB: {e}")
+                self._connection_lost(e)
+                if self.local:
+                    self.local.create_user(user)
+        elif self.local:
+            self.local.create_user(user)
+            logger.info(f"Created user (local): {username}")
         else:
             logger.info(f"Created user (in-memory): {username}")
         return user
@@ -53,7 +259,7 @@ class Database:
     def get_user(self, user_id=None, username=None):
         """Get user by user_id or username"""
         if not self.connected:
-            return None
+            return self.local.get_user(user_id, username) if self.local else None
         try:
             if user_id:
                 return self.users.find_one({'user_id': user_id})
@@ -61,11 +267,15 @@ class Database:
                 return self.users.find_one({'username': username})
         except Exception as e:
             logger.warning(f"Failed to get user from MongoDB: {e}")
+            if self._connection_lost(e):
+                return self.get_user(user_id, username)
         return None
     
     def update_user_language(self, user_id, language):
         """Update user's preferred language"""
         if not self.connected:
+            if self.local:
+                self.local.update_user_language(user_id, language)
             return
         try:
             self.users.update_one(
@@ -74,6 +284,8 @@ class Database:
             )
         except Exception as e:
             logger.warning(f"Failed to update user language: {e}")
+            if self._connection_lost(e):
+                return self.update_user_language(user_id, language)
     
     def save_message(self, message_data):
         """Save message to database"""
@@ -81,7 +293,7 @@ class Database:
             'message_id': str(ObjectId()),
             'user_id': message_data['user_id'],
             'username': message_data['username'],
-            'room_id': message_data['room_id'],
+            'room_id': self.canonical_room_id(message_data['room_id']),
             'original_text': message_data['original_text'],
             'timestamp': datetime.utcnow(),
             'is_flagged': message_data.get('is_flagged', False),
@@ -94,14 +306,20 @@ class Database:
                 logger.info(f"Saved message from {message_data['username']} in room {message_data['room_id']}")
             except Exception as e:
                 logger.warning(f"Failed to save message to MongoDB: {e}")
+                self._connection_lost(e)
+                if self.local:
+                    self.local.save_message(message)
+        elif self.local:
+            self.local.save_message(message)
+            logger.info(f"Saved message (local) from {message_data['username']} in room {message_data['room_id']}")
         else:
             logger.info(f"Saved message (in-memory) from {message_data['username']} in room {message_data['room_id']}")
         return message
     
-    def get_messages(self, room_id, limit=50):
-        """Get recent messages for a room"""
+    def get_messages(self, room_id, limit=50, strict=False):
+        """Get recent messages for a room (a MongoDB error returns [] unless strict, which raises it)"""
         if not self.connected:
-            return []
+            return self.local.get_messages(room_id, limit) if self.local else []
         try:
             messages = list(self.messages.find(
                 {'room_id': room_id}
@@ -115,11 +333,70 @@ class Database:
             return list(reversed(messages))  # Return in chronological order
         except Exception as e:
             logger.warning(f"Failed to get messages from MongoDB: {e}")
+            # Strict callers retry later rather than take the local store's partial history
+            if self._connection_lost(e) and not strict:
+                return self.get_messages(room_id, limit)
+            if strict:
+                raise
             return []
     
+    def get_messages_since(self, room_id, message_id, limit=50):
+        """Get up to limit messages posted in a room after message_id, oldest first; None if message_id is unknown"""
+        if not self.connected:
+            return self.local.get_messages_since(room_id, message_id, limit) if self.local else None
+        try:
+            anchor = self.messages.find_one({'room_id': room_id, 'message_id': message_id}, {'timestamp': 1})
+            if not anchor:
+                return None
+            messages = list(self.messages.find({
+                'room_id': room_id,
+                'timestamp': {'$gte': anchor['timestamp']},
+                'message_id': {'$ne': message_id}
+            }).sort('timestamp', 1).limit(limit))
+            for msg in messages:
+                msg['_id'] = str(msg['_id'])
+                msg['timestamp'] = msg['timestamp'].isoformat()
+            return messages
+        except Exception as e:
+            logger.warning(f"Failed to get messages since {message_id} from MongoDB: {e}")
+            if self._connection_lost(e):
+                return self.get_messages_since(room_id, message_id, limit)
+            return None
+    
+    def iter_messages(self, room_id, start=None, end=None, languages=None, batch_size=None):
+        """Yield a room's messages oldest first, fetched in batches (constant memory for any room size).
+        
+        start/end bound the timestamp (naive UTC datetimes, end exclusive);
+        languages limits the translations included to those language codes.
+        """
+        batch_size = batch_size or Config.EXPORT_BATCH_SIZE
+        if not self.connected:
+            if self.local:
+                yield from self.local.iter_messages(room_id, start, end, languages, batch_size)
+            return
+        query = {'room_id': room_id}
+        if start or end:
+            query['timestamp'] = {}
+            if start:
+                query['timestamp']['$gte'] = start
+            if end:
+                query['timestamp']['$lt'] = end
+        projection = {'_id': 0}
+        if languages is not None:
+            projection = dict.fromkeys(_MESSAGE_FIELDS, 1)
+            projection.update((f'translations.{language}', 1) for language in languages)
+            projection['_id'] = 0
+        with self.messages.find(query, projection).sort('timestamp', 1).batch_size(batch_size) as cursor:
+            for msg in cursor:
+                msg['timestamp'] = msg['timestamp'].isoformat()
+                msg.setdefault('translations', {})
+                yield msg
+    
     def get_cached_translation(self, text, source_lang, target_lang):
         """Get cached translation if exists"""
         if not self.connected:
+            if self.local:
+                return self.local.get_cached_translations([f"{text}_{source_lang}_{target_lang}"]).get(text)
             return None
         try:
             cache_key = f"{text}_{source_lang}_{target_lang}"
@@ -128,29 +405,113 @@ class Database:
                 return cached.get('translated_text')
         except Exception as e:
             logger.warning(f"Failed to get cached translation from MongoDB: {e}")
+            if self._connection_lost(e):
+                return self.get_cached_translation(text, source_lang, target_lang)
         return None
     
+    def get_cached_translations(self, texts, source_lang, target_lang):
+        """Get cached translations for many texts in one query; returns text -> translation"""
+        if not texts:
+            return {}
+        if not self.connected:
+            if self.local:
+                return self.local.get_cached_translations([f"{text}_{source_lang}_{target_lang}" for text in texts])
+            return {}
+        try:
+            cache_keys = [f"{text}_{source_lang}_{target_lang}" for text in texts]
+            cached = self.translations.find(
+                {'cache_key': {'$in': cache_keys}},
+                {'original_text': 1, 'translated_text': 1}
+            )
+            return {doc['original_text']: doc['translated_text'] for doc in cached}
+        except Exception as e:
+            logger.warning(f"Failed to get cached translations from MongoDB: {e}")
+            if self._connection_lost(e):
+                return self.get_cached_translations(texts, source_lang, target_lang)
+        return {}
+    
     def cache_translation(self, text, source_lang, target_lang, translated_text):
         """Cache a translation"""
+        self.cache_translations({text: translated_text}, source_lang, target_lang)
+    
+    def cache_translations(self, translations, source_lang, target_lang):
+        """Cache many translations (text -> translated text) in one bulk write"""
+        if not translations:
+            return
         if not self.connected:
+            if self.local:
+                now = datetime.utcnow()
+                for text, translated_text in translations.items():
+                    self.local.cache_translation(f"{text}_{source_lang}_{target_lang}", {
+                        'original_text': text,
+                        'source_language': source_lang,
+                        'target_language': target_lang,
+                        'translated_text': translated_text,
+                        'cached_at': now
+                    })
             return
         try:
-            cache_key = f"{text}_{source_lang}_{target_lang}"
-            self.translations.insert_one({
-                'cache_key': cache_key,
-                'original_text': text,
-                'source_language': source_lang,
-                'target_language': target_lang,
-                'translated_text': translated_text,
-                'cached_at': datetime.utcnow()
-            })
+            now = datetime.utcnow()
+            self.translations.bulk_write([
+                UpdateOne(
+                    {'cache_key': f"{text}_{source_lang}_{target_lang}"},
+                    {'$set': {
+                        'original_text': text,
+                        'source_language': source_lang,
+                        'target_language': target_lang,
+                        'translated_text': translated_text,
+                        'cached_at': now
+                    }},
+                    upsert=True
+                )
+                for text, translated_text in translations.items()
+            ], ordered=False)
         except Exception as e:
             logger.warning(f"Failed to cache translation in MongoDB: {e}")
+            if self._connection_lost(e):
+                return self.cache_translations(translations, source_lang, target_lang)
+    
+    def get_cached_moderation(self, fingerprint, threshold, max_age=None):
+        """Get cached moderation verdict for a text fingerprint if exists"""
+        if not self.connected:
+            if self.local:
+                min_cached_at = datetime.utcnow() - timedelta(seconds=max_age) if max_age else None
+                return self.local.get_cached_moderation(fingerprint, threshold, min_cached_at)
+            return None
+        try:
+            query = {'fingerprint': fingerprint, 'threshold': threshold}
+            if max_age:
+                query['cached_at'] = {'$gte': datetime.utcnow() - timedelta(seconds=max_age)}
+            cached = self.moderations.find_one(query)
+            if cached:
+                return cached.get('result')
+        except Exception as e:
+            logger.warning(f"Failed to get cached moderation from MongoDB: {e}")
+            if self._connection_lost(e):
+                return self.get_cached_moderation(fingerprint, threshold, max_age)
+        return None
+    
+    def cache_moderation(self, fingerprint, threshold, result):
+        """Cache a moderation verdict"""
+        if not self.connected:
+            if self.local:
+                self.local.cache_moderation(fingerprint, threshold, result)
+            return
+        try:
+            self.moderations.update_one(
+                {'fingerprint': fingerprint, 'threshold': threshold},
+                {'$set': {'result': result, 'cached_at': datetime.utcnow()}},
+                upsert=True
+            )
+        except Exception as e:
+            logger.warning(f"Failed to cache moderation in MongoDB: {e}")
+            if self._connection_lost(e):
+                return self.cache_moderation(fingerprint, threshold, result)
     
     def create_room(self, room_name):
         """Create a new chat room"""
         room = {
-            'room_id': str(ObjectId()),
+            'room_id': room_id_for(room_name),
             'room_name': room_name,
             'created_at': datetime.utcnow()
         }
@@ -160,6 +521,12 @@ class Database:
                 logger.info(f"Created room: {room_name}")
             except Exception as e:
                 logger.warning(f"Failed to save room to MongoDB: {e}")
+                self._connection_lost(e)
+                if self.local:
+                    self.local.create_room(room)
+        elif self.local:
+            self.local.create_room(room)
+            logger.info(f"Created room (local): {room_name}")
         else:
             logger.info(f"Created room (in-memory): {room_name}")
         return room
@@ -167,7 +534,7 @@ class Database:
     def get_rooms(self):
         """Get all available rooms"""
         if not self.connected:
-            return []
+            return self.local.get_rooms() if self.local else []
         try:
             rooms = list(self.rooms.find())
             for room in rooms:
@@ -176,12 +543,19 @@ class Database:
             return rooms
         except Exception as e:
             logger.warning(f"Failed to get rooms from MongoDB: {e}")
+            if self._connection_lost(e):
+                return self.get_rooms()
             return []
     
+    def canonical_room_id(self, room_id):
+        """The MongoDB id for a local room id merged into a MongoDB room on replay (other ids unchanged)"""
+        return self.room_aliases.get(room_id, room_id)
+    
     def get_room(self, room_id=None, room_name=None):
         """Get room by room_id or room_name"""
+        room_id = self.canonical_room_id(room_id)
         if not self.connected:
-            return None
+            return self.local.get_room(room_id, room_name) if self.local else None
         try:
             if room_id:
                 return self.rooms.find_one({'room_id': room_id})
@@ -189,14 +563,158 @@ class Database:
                 return self.rooms.find_one({'room_name': room_name})
         except Exception as e:
             logger.warning(f"Failed to get room from MongoDB: {e}")
+            if self._connection_lost(e):
+                return self.get_room(room_id, room_name)
         return None
     
     def get_or_create_room(self, room_name):
         """Get existing room or create if it doesn't exist"""
         room = self.get_room(room_name=room_name)
-        if not room:
-            room = self.create_room(room_name)
-        return room
+        if room:
+            return room
+        if self.connected:
+            # Upsert so concurrent callers (or workers) never create duplicates
+            try:
+                room = self.rooms.find_one_and_update(
+                    {'room_name': room_name},
+                    {'$setOnInsert': {
+                        'room_id': room_id_for(room_name),
+                        'room_name': room_name,
+                        'created_at': datetime.utcnow()
+                    }},
+                    upsert=True,
+                    return_document=ReturnDocument.AFTER
+                )
+                logger.info(f"Got or created room: {room_name}")
+                return room
+            except Exception as e:
+                logger.warning(f"Failed to upsert room in MongoDB: {e}")
+                self._connection_lost(e)
+        return self.create_room(room_name)
+    
+    def replay_local_store(self):
+        """Copy documents written to the local store while MongoDB was down into MongoDB.
+        
+        Rooms and users are matched by name, so one created locally during the
+        outage (e.g. the default 'general' room) merges into the existing
+        MongoDB document, and replayed messages are moved to its id. Each table
+        is replayed on its own; documents that fail stay pending for the next
+        reconnect. Returns {local room id: MongoDB room id} for rooms merged this
+        time, so live sessions can be moved as well.
+        """
+        if not self.local or not Config.LOCAL_STORE_REPLAY or not self.connected:
+            return {}
+        self._replay_table('users', self.users, 'user_id', match='username')
+        self._replay_table('rooms', self.rooms, 'room_id', match='room_name')
+        moved = self._merge_rooms()
+        mongo_ids = {'room_id': dict(self.room_aliases), 'user_id': {}}  # local id -> MongoDB id
+        self._replay_table('messages', self.messages, 'message_id',
+                           prepare=lambda doc: self._remap_message(doc, mongo_ids))
+        self._replay_table('translations', self.translations, 'cache_key')
+        return moved
+    
+    def _merge_rooms(self):
+        """Move local rooms whose name has a MongoDB room under another id to that id; returns the newly merged ids"""
+        try:
+            local_rooms = self.local.get_rooms()
+            names = [room['room_name'] for room in local_rooms]
+            mongo_rooms = {room['room_name']: room for room in self.rooms.find({'room_name': {'$in': names}})}
+        except Exception as e:
+            logger.warning(f"Failed to match local rooms with MongoDB rooms: {e}")
+            self._connection_lost(e)
+            return {}
+        moved = {}
+        for room in local_rooms:
+            mongo_room = mongo_rooms.get(room['room_name'])
+            if not mongo_room or mongo_room['room_id'] == room['room_id']:
+                continue
+            try:
+                self.local.move_room(room['room_id'], mongo_room)
+            except Exception as e:
+                logger.warning(f"Failed to move local room {room['room_name']} to its MongoDB id: {e}")
+            moved[room['room_id']] = mongo_room['room_id']
+        if moved:
+            self.room_aliases.update(moved)
+            logger.info(f"Merged {len(moved)} local room(s) into existing MongoDB rooms")
+        return moved
+    
+    def _replay_table(self, table, collection, key, match=None, prepare=None):
+        """Upsert one local store table into MongoDB batch by batch, keyed by match (default: the table key)"""
+        match = match or key
+        replayed = failed = 0
+        after = None
+        while self.connected:  # stop if the connection is lost mid-replay
+            try:
+                batch = self.local.pending_replay(table, Config.LOCAL_STORE_BATCH_SIZE, after)
+            except Exception as e:
+                logger.warning(f"Failed to read pending {table} from local store: {e}")
+                break
+            if not batch:
+                break
+            after = batch[-1][0]
+            
+            docs = []
+            for row_key, doc in batch:
+                try:
+                    doc = dict(doc, **{key: row_key})
+                    docs.append((row_key, prepare(doc) if prepare else doc))
+                except Exception as e:
+                    failed += 1
+                    logger.warning(f"Failed to prepare {table} {row_key} for replay: {e}")
+            if not docs:
+                continue
+            
+            try:
+                collection.bulk_write([
+                    UpdateOne({match: doc[match]}, {'$setOnInsert': doc}, upsert=True)
+                    for _, doc in docs
+                ], ordered=False)
+                done = [row_key for row_key, _ in docs]
+            except BulkWriteError as e:
+                errors = e.details.get('writeErrors', [])
+                rejected = {error['index'] for error in errors}
+                done = [row_key for index, (row_key, _) in enumerate(docs) if index not in rejected]
+                failed += len(rejected)
+                for error in errors[:3]:
+                    logger.warning(f"Failed to replay {table} {docs[error['index']][0]}: {error.get('errmsg')}")
+            except Exception as e:
+                logger.warning(f"Failed to replay {table} into MongoDB, will retry on next reconnect: {e}")
+                self._connection_lost(e)
+                break
+            
+            self.local.mark_replayed(table, done)
+            replayed += len(done)
+        if replayed or failed:
+            logger.info(f"Replayed {replayed} {table} from local store into MongoDB ({failed} failed)")
+    
+    def _remap_message(self, message, mongo_ids):
+        """Point a locally stored message at the MongoDB room and user with the same name"""
+        lookups = {
+            'room_id': (lambda local_id: self.local.get_room(room_id=local_id), self.rooms, 'room_name'),
+            'user_id': (lambda local_id: self.local.get_user(user_id=local_id), self.users, 'username'),
+        }
+        for field, (get_local, collection, name_field) in lookups.items():
+            local_id = message.get(field)
+            if not local_id:
+                continue
+            ids = mongo_ids[field]
+            if local_id not in ids:
+                local_doc = get_local(local_id)
+                existing = collection.find_one({name_field: local_doc[name_field]}, {field: 1}) if local_doc else None
+                ids[local_id] = existing[field] if existing else local_id
+            message[field] = ids[local_id]
+        return message
+    
+    def pool_stats(self):
+        """Connection pool statistics"""
+        return self.pool_monitor.stats()
+    
+    def ensure_default_room(self):
+        """Create the default 'general' room if it doesn't exist (idempotent)"""
+        try:
+            self.get_or_create_room('general')
+        except Exception as e:
+            logger.error(f"Failed to initialize default room: {e}")
 
 # Global database instance
 db = Database()
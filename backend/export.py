@@ -0,0 +1,91 @@
+"""Streaming room history export as NDJSON (one message per line), optionally gzip-compressed.
+
+Messages are read from the database in batches and encoded into fixed-size
+chunks as they are consumed, so memory use does not grow with the room size.
+"""
+from datetime import datetime, timezone
+import json
+import logging
+import re
+import zlib
+from typing import Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Bytes buffered before a chunk is handed to the response
+_CHUNK_SIZE = 64 * 1024
+
+_LANGUAGE_RE = re.compile(r'^[A-Za-z]{2,3}(-[A-Za-z0-9]{2,8})?$')
+
+class StreamingBody:
+    """Route handler result that is streamed instead of returned as JSON"""
+
+    __slots__ = ('chunks', 'content_type', 'filename')
+
+    def __init__(self, chunks: Iterator[bytes], content_type: str, filename: str):
+        self.chunks = chunks
+        self.content_type = content_type
+        self.filename = filename
+
+    def headers(self) -> dict:
+        """Response headers for the download"""
+        return {
+            'Content-Disposition': f'attachment; filename="{self.filename}"',
+            'Cache-Control': 'no-store'
+        }
+
+def parse_time(value: Optional[str]) -> Optional[datetime]:
+    """Naive UTC datetime from an ISO 8601 string (as messages are stored); raises ValueError"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def parse_languages(value: Optional[str]) -> Optional[List[str]]:
+    """Language codes from a comma-separated list; None for all languages. Raises ValueError"""
+    if value is None:
+        return None
+    languages = [language.strip() for language in value.split(',') if language.strip()]
+    for language in languages:
+        if not _LANGUAGE_RE.match(language):
+            raise ValueError(f'Invalid language code: {language}')
+    return languages
+
+def ndjson_chunks(messages: Iterable[dict], compress: bool = False, chunk_size: int = _CHUNK_SIZE) -> Iterator[bytes]:
+    """Encode messages as NDJSON and yield it in chunks of about chunk_size bytes (gzip stream if compress)"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buffer = []
+    buffered = 0
+    count = 0
+    try:
+        for message in messages:
+            line = json.dumps(message, ensure_ascii=False, default=str, separators=(',', ':')).encode('utf-8') + b'\n'
+            buffer.append(line)
+            buffered += len(line)
+            count += 1
+            if buffered >= chunk_size:
+                data = b''.join(buffer)
+                buffer.clear()
+                buffered = 0
+                if compressor:
+                    data = compressor.compress(data)
+                if data:
+                    yield data
+        data = b''.join(buffer)
+        if compressor:
+            data = compressor.compress(data) + compressor.flush()
+        if data:
+            yield data
+    except Exception as e:
+        # The response is already under way; end it without the final chunk so clients see it truncated
+        logger.error(f"Export failed after {count} messages: {e}")
+        raise
+    logger.info(f"Exported {count} messages")
+
+def export_filename(room_name: str, compress: bool) -> str:
+    """Download file name for a room export"""
+    safe_name = re.sub(r'[^\w.-]+', '_', room_name) or 'room'
+    stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
+    return f"{safe_name}-{stamp}.ndjson{'.gz' if compress else ''}"
@@ -0,0 +1,56 @@
+"""Export a room's full message history as NDJSON (one message per line).
+
+Reads straight from the database in batches, so rooms of any size export in
+constant memory. Uses MONGODB_URI, or the local store when MongoDB is not
+reachable.
+
+Usage: python export_room.py <room id or name> [-o FILE] [--gzip] [--since ISO] [--until ISO] [--languages en,es]
+"""
+import argparse
+import logging
+import sys
+
+from database import db
+from export import ndjson_chunks, parse_time, parse_languages
+
+logger = logging.getLogger(__name__)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('room', help='room id or room name')
+    parser.add_argument('-o', '--output', help='output file (default: stdout)')
+    parser.add_argument('--gzip', action='store_true', help='gzip-compress the output')
+    parser.add_argument('--since', help='only messages at or after this ISO 8601 time (UTC if no offset)')
+    parser.add_argument('--until', help='only messages before this ISO 8601 time (UTC if no offset)')
+    parser.add_argument('--languages', help='comma-separated translation languages to include (default: all)')
+    parser.add_argument('--batch-size', type=int, help='messages fetched per database round trip')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', stream=sys.stderr)
+
+    try:
+        start = parse_time(args.since)
+        end = parse_time(args.until)
+        languages = parse_languages(args.languages)
+    except ValueError as e:
+        parser.error(str(e))
+
+    # Read-only: leave writes made during an outage for the server to replay
+    db.connect(replay=False)
+    room = db.get_room(room_id=args.room) or db.get_room(room_name=args.room)
+    if not room:
+        logger.error(f"Room not found: {args.room}")
+        return 1
+
+    messages = db.iter_messages(room['room_id'], start, end, languages, args.batch_size)
+    output = open(args.output, 'wb') if args.output else sys.stdout.buffer
+    try:
+        for chunk in ndjson_chunks(messages, args.gzip):
+            output.write(chunk)
+    finally:
+        if args.output:
+            output.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
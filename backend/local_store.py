@@ -0,0 +1,332 @@
+from datetime import datetime
+import atexit
+import json
+import logging
+import sqlite3
+import threading
+import time
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Document fields stored as ISO strings and restored as datetimes
+_DATETIME_FIELDS = ('timestamp', 'created_at', 'cached_at')
+
+# Replayable table -> primary key
+_REPLAY_KEYS = {
+    'messages': 'message_id',
+    'rooms': 'room_id',
+    'users': 'user_id',
+    'translations': 'cache_key',
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    message_id TEXT PRIMARY KEY,
+    room_id TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    doc TEXT NOT NULL,
+    replayed INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS messages_room_timestamp ON messages (room_id, timestamp);
+CREATE TABLE IF NOT EXISTS rooms (
+    room_id TEXT PRIMARY KEY,
+    room_name TEXT NOT NULL,
+    doc TEXT NOT NULL,
+    replayed INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS rooms_name ON rooms (room_name);
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    username TEXT NOT NULL,
+    doc TEXT NOT NULL,
+    replayed INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS users_username ON users (username);
+CREATE TABLE IF NOT EXISTS translations (
+    cache_key TEXT PRIMARY KEY,
+    original_text TEXT NOT NULL,
+    translated_text TEXT NOT NULL,
+    doc TEXT NOT NULL,
+    replayed INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS moderations (
+    fingerprint TEXT NOT NULL,
+    threshold REAL NOT NULL,
+    cached_at TEXT NOT NULL,
+    result TEXT NOT NULL,
+    PRIMARY KEY (fingerprint, threshold)
+);
+"""
+
+def _encode(doc):
+    """Serialize a document (datetimes as ISO strings, Mongo _id dropped)"""
+    doc = {key: value for key, value in doc.items() if key != '_id'}
+    return json.dumps(doc, default=lambda v: v.isoformat() if isinstance(v, datetime) else str(v))
+
+def _decode(raw):
+    """Deserialize a document, restoring datetime fields"""
+    doc = json.loads(raw)
+    for field in _DATETIME_FIELDS:
+        if isinstance(doc.get(field), str):
+            doc[field] = datetime.fromisoformat(doc[field])
+    return doc
+
+class LocalStore:
+    """Embedded SQLite (WAL mode) storage used while MongoDB is unavailable.
+
+    Messages and translation cache entries are written in batches by a
+    background flusher; rooms and users are written immediately. Reads flush
+    pending writes first. Rows not yet copied to MongoDB are marked so they can
+    be replayed when it comes back.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+        self._lock = threading.RLock()
+        self._pending = []  # (sql, params) waiting for the next batch
+        self._flusher = None
+
+    def _connection(self):
+        """Open the database on first use"""
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.executescript(_SCHEMA)
+            atexit.register(self.flush)
+            logger.info(f"Opened local store at {self.path}")
+        return self._conn
+
+    def _enqueue(self, sql, params):
+        """Queue a write for the next batch"""
+        with self._lock:
+            self._pending.append((sql, params))
+            if len(self._pending) >= Config.LOCAL_STORE_BATCH_SIZE:
+                self._flush_locked()
+            elif self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name='local-store-flusher', daemon=True)
+                self._flusher.start()
+
+    def _flush_loop(self):
+        """Flush pending writes periodically"""
+        while True:
+            time.sleep(Config.LOCAL_STORE_FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Local store flush failed: {e}")
+
+    def _flush_locked(self):
+        """Write pending changes; caller holds the lock"""
+        if not self._pending:
+            return
+        conn = self._connection()
+        with conn:
+            for sql, params in self._pending:
+                conn.execute(sql, params)
+        self._pending = []
+
+    def flush(self):
+        """Write all pending changes in one transaction"""
+        with self._lock:
+            self._flush_locked()
+
+    def _query(self, sql, params=()):
+        """Run a read query after flushing pending writes"""
+        with self._lock:
+            self._flush_locked()
+            return self._connection().execute(sql, params).fetchall()
+
+    def _write(self, sql, params):
+        """Write immediately"""
+        with self._lock:
+            self._flush_locked()
+            conn = self._connection()
+            with conn:
+                conn.execute(sql, params)
+
+    def create_user(self, user):
+        """Store a user"""
+        self._write(
+            'INSERT OR REPLACE INTO users (user_id, username, doc, replayed) VALUES (?, ?, ?, 0)',
+            (user['user_id'], user['username'], _encode(user))
+        )
+
+    def get_user(self, user_id=None, username=None):
+        """Get user by user_id or username"""
+        if user_id:
+            rows = self._query('SELECT doc FROM users WHERE user_id = ?', (user_id,))
+        elif username:
+            rows = self._query('SELECT doc FROM users WHERE username = ? LIMIT 1', (username,))
+        else:
+            return None
+        return _decode(rows[0][0]) if rows else None
+
+    def update_user_language(self, user_id, language):
+        """Update user's preferred language"""
+        user = self.get_user(user_id=user_id)
+        if user:
+            user['preferred_language'] = language
+            self.create_user(user)
+
+    def save_message(self, message):
+        """Queue a message for the next batch"""
+        self._enqueue(
+            'INSERT OR REPLACE INTO messages (message_id, room_id, timestamp, doc, replayed) VALUES (?, ?, ?, ?, 0)',
+            (message['message_id'], message['room_id'], message['timestamp'].isoformat(), _encode(message))
+        )
+
+    def get_messages(self, room_id, limit=50):
+        """Get recent messages for a room in chronological order"""
+        rows = self._query(
+            'SELECT doc FROM messages WHERE room_id = ? ORDER BY timestamp DESC LIMIT ?',
+            (room_id, limit)
+        )
+        messages = [_decode(doc) for (doc,) in reversed(rows)]
+        for msg in messages:
+            msg['timestamp'] = msg['timestamp'].isoformat()
+        return messages
+
+    def get_messages_since(self, room_id, message_id, limit=50):
+        """Get messages posted in a room after message_id, oldest first; None if message_id is unknown"""
+        anchor = self._query(
+            'SELECT timestamp FROM messages WHERE room_id = ? AND message_id = ?',
+            (room_id, message_id)
+        )
+        if not anchor:
+            return None
+        rows = self._query(
+            'SELECT doc FROM messages WHERE room_id = ? AND timestamp >= ? AND message_id != ? ORDER BY timestamp LIMIT ?',
+            (room_id, anchor[0][0], message_id, limit)
+        )
+        messages = [_decode(doc) for (doc,) in rows]
+        for msg in messages:
+            msg['timestamp'] = msg['timestamp'].isoformat()
+        return messages
+
+    def iter_messages(self, room_id, start=None, end=None, languages=None, batch_size=1000):
+        """Yield a room's messages oldest first, one keyset-paginated batch at a time"""
+        clauses = ['room_id = ?']
+        params = [room_id]
+        if start:
+            clauses.append('timestamp >= ?')
+            params.append(start.isoformat())
+        if end:
+            clauses.append('timestamp < ?')
+            params.append(end.isoformat())
+        sql = f"SELECT timestamp, message_id, doc FROM messages WHERE {' AND '.join(clauses)} AND (timestamp, message_id) > (?, ?) ORDER BY timestamp, message_id LIMIT ?"
+        after = ('', '')
+        while True:
+            rows = self._query(sql, (*params, *after, batch_size))
+            for _, _, doc in rows:
+                msg = _decode(doc)
+                msg['timestamp'] = msg['timestamp'].isoformat()
+                if languages is not None:
+                    msg['translations'] = {
+                        language: text for language, text in (msg.get('translations') or {}).items() if language in languages
+                    }
+                yield msg
+            if len(rows) < batch_size:
+                return
+            after = rows[-1][:2]
+
+    def get_cached_translations(self, cache_keys):
+        """Get cached translations by cache key; returns text -> translation"""
+        placeholders = ','.join('?' * len(cache_keys))
+        rows = self._query(
+            f'SELECT original_text, translated_text FROM translations WHERE cache_key IN ({placeholders})',
+            cache_keys
+        )
+        return dict(rows)
+
+    def cache_translation(self, cache_key, doc):
+        """Queue a translation cache entry for the next batch"""
+        self._enqueue(
+            'INSERT OR REPLACE INTO translations (cache_key, original_text, translated_text, doc, replayed) VALUES (?, ?, ?, ?, 0)',
+            (cache_key, doc['original_text'], doc['translated_text'], _encode(doc))
+        )
+
+    def get_cached_moderation(self, fingerprint, threshold, min_cached_at=None):
+        """Get cached moderation verdict if exists and is fresh enough"""
+        rows = self._query(
+            'SELECT result, cached_at FROM moderations WHERE fingerprint = ? AND threshold = ?',
+            (fingerprint, threshold)
+        )
+        if not rows:
+            return None
+        result, cached_at = rows[0]
+        if min_cached_at and datetime.fromisoformat(cached_at) < min_cached_at:
+            return None
+        return json.loads(result)
+
+    def cache_moderation(self, fingerprint, threshold, result):
+        """Queue a moderation verdict for the next batch"""
+        self._enqueue(
+            'INSERT OR REPLACE INTO moderations (fingerprint, threshold, cached_at, result) VALUES (?, ?, ?, ?)',
+            (fingerprint, threshold, datetime.utcnow().isoformat(), json.dumps(result))
+        )
+
+    def create_room(self, room):
+        """Store a room"""
+        self._write(
+            'INSERT OR REPLACE INTO rooms (room_id, room_name, doc, replayed) VALUES (?, ?, ?, 0)',
+            (room['room_id'], room['room_name'], _encode(room))
+        )
+
+    def get_rooms(self):
+        """Get all rooms"""
+        rooms = [_decode(doc) for (doc,) in self._query('SELECT doc FROM rooms ORDER BY rowid')]
+        for room in rooms:
+            room['created_at'] = room['created_at'].isoformat()
+        return rooms
+
+    def get_room(self, room_id=None, room_name=None):
+        """Get room by room_id or room_name"""
+        if room_id:
+            rows = self._query('SELECT doc FROM rooms WHERE room_id = ?', (room_id,))
+        elif room_name:
+            rows = self._query('SELECT doc FROM rooms WHERE room_name = ? ORDER BY rowid LIMIT 1', (room_name,))
+        else:
+            return None
+        return _decode(rows[0][0]) if rows else None
+
+    def move_room(self, room_id, room):
+        """Replace a room by the MongoDB room it was merged into, moving its messages to that id"""
+        new_id = room['room_id']
+        with self._lock:
+            self._flush_locked()
+            conn = self._connection()
+            rows = conn.execute('SELECT message_id, doc FROM messages WHERE room_id = ?', (room_id,)).fetchall()
+            with conn:
+                conn.execute('DELETE FROM rooms WHERE room_id = ?', (room_id,))
+                conn.execute(
+                    'INSERT OR REPLACE INTO rooms (room_id, room_name, doc, replayed) VALUES (?, ?, ?, 1)',
+                    (new_id, room['room_name'], _encode(room))
+                )
+                for message_id, doc in rows:
+                    message = _decode(doc)
+                    message['room_id'] = new_id
+                    conn.execute(
+                        'UPDATE messages SET room_id = ?, doc = ? WHERE message_id = ?',
+                        (new_id, _encode(message), message_id)
+                    )
+
+    def pending_replay(self, table, batch_size, after=None):
+        """Documents not yet copied to MongoDB with keys after `after`, as (key, doc) pairs in key order"""
+        key = _REPLAY_KEYS[table]
+        if after is None:
+            rows = self._query(f'SELECT {key}, doc FROM {table} WHERE replayed = 0 ORDER BY {key} LIMIT ?', (batch_size,))
+        else:
+            rows = self._query(
+                f'SELECT {key}, doc FROM {table} WHERE replayed = 0 AND {key} > ? ORDER BY {key} LIMIT ?',
+                (after, batch_size)
+            )
+        return [(row_key, _decode(doc)) for row_key, doc in rows]
+
+    def mark_replayed(self, table, keys):
+        """Mark documents as copied to MongoDB"""
+        key = _REPLAY_KEYS[table]
+        placeholders = ','.join('?' * len(keys))
+        self._write(f'UPDATE {table} SET replayed = 1 WHERE {key} IN ({placeholders})', list(keys))
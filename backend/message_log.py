@@ -0,0 +1,65 @@
+from collections import deque
+import logging
+import threading
+from typing import Dict, List, Optional
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+class MessageLog:
+    """Recent broadcast messages per room, used to replay what a reconnecting client missed"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._rooms = {}  # room_id -> deque of message payloads (oldest first)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def append(self, room_id: str, message: Dict):
+        """Record a message broadcast to a room"""
+        with self._lock:
+            log = self._rooms.get(room_id)
+            if log is None:
+                log = self._rooms[room_id] = deque(maxlen=self.size)
+            log.append(message)
+
+    def move_room(self, room_id: str, new_room_id: str):
+        """Move a room's recent messages to another room id, merged in timestamp order"""
+        with self._lock:
+            log = self._rooms.pop(room_id, None)
+            if not log:
+                return
+            moved = [dict(message, room_id=new_room_id) for message in log]
+            merged = sorted(list(self._rooms.get(new_room_id, ())) + moved, key=lambda message: message['timestamp'])
+            self._rooms[new_room_id] = deque(merged, maxlen=self.size)
+
+    def since(self, room_id: str, message_id: str) -> Optional[List[Dict]]:
+        """Messages after message_id, oldest first; None if message_id is not in the log"""
+        with self._lock:
+            log = self._rooms.get(room_id)
+            if log:
+                missed = []
+                for message in reversed(log):
+                    if message['message_id'] == message_id:
+                        self.hits += 1
+                        missed.reverse()
+                        return missed
+                    missed.append(message)
+            self.misses += 1
+            return None
+
+    def stats(self) -> Dict:
+        """Size and hit-rate statistics"""
+        lookups = self.hits + self.misses
+        return {
+            'rooms': len(self._rooms),
+            'messages': sum(len(log) for log in self._rooms.values()),
+            'size_per_room': self.size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+# Global message log instance
+message_log = MessageLog(Config.MESSAGE_LOG_SIZE)
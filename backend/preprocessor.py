@@ -0,0 +1,103 @@
+import logging
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Spans that are never translated and must survive translation verbatim. Like
+# common linkifiers, URLs keep balanced parentheses but not trailing punctuation
+_PROTECTED_RE = re.compile(
+    r'(?P<code>```.*?```|`[^`\n]+`)'
+    r'|(?P<url>(?:https?://|www\.)(?:\([^\s()]*\)|[^\s()])*(?:\([^\s()]*\)|[^\s().,;:!?\'"\]}]))'
+    r'|(?P<mention>@\w+)'
+    r'|(?P<number>[+-]?\d[\d.,:/%-]*)',
+    re.DOTALL
+)
+_PLACEHOLDER = '[[{}]]'
+_PLACEHOLDER_RE = re.compile(r'\[\[(\d+)\]\]')
+
+class Span:
+    """A piece of a message and whether it needs translation"""
+    __slots__ = ('text', 'kind', 'translatable')
+
+    def __init__(self, text: str, kind: str, translatable: bool):
+        self.text = text
+        self.kind = kind
+        self.translatable = translatable
+
+    def __repr__(self):
+        return f"Span({self.text!r}, {self.kind!r}, {self.translatable})"
+
+def _has_letters(text: str) -> bool:
+    """Whether text contains any alphabetic character (emoji and symbols are not)"""
+    return any(c.isalpha() for c in text)
+
+class Preprocessor:
+    """Splits messages into translatable and non-translatable spans ahead of the AI pipeline"""
+
+    def __init__(self):
+        self.skipped = Counter()  # AI call name -> number of calls skipped
+        self._lock = threading.Lock()
+
+    def tokenize(self, text: str) -> List[Span]:
+        """Split text into protected spans (code, URLs, mentions, numbers) and text spans"""
+        spans = []
+        pos = 0
+        for match in _PROTECTED_RE.finditer(text):
+            if match.start() > pos:
+                chunk = text[pos:match.start()]
+                spans.append(Span(chunk, 'text', _has_letters(chunk)))
+            spans.append(Span(match.group(), match.lastgroup, False))
+            pos = match.end()
+        if pos < len(text):
+            chunk = text[pos:]
+            spans.append(Span(chunk, 'text', _has_letters(chunk)))
+        return spans
+
+    def is_translatable(self, text: str) -> bool:
+        """Whether any part of text needs language detection, moderation or translation"""
+        return any(span.translatable for span in self.tokenize(text))
+
+    def needs_moderation(self, text: str) -> bool:
+        """Whether text has any letters, including inside code, URLs and mentions (which can carry abuse too)"""
+        return _has_letters(text)
+
+    def translatable_text(self, text: str) -> str:
+        """Text with all protected spans removed"""
+        return ' '.join(span.text.strip() for span in self.tokenize(text) if span.translatable)
+
+    def mask(self, text: str) -> Tuple[str, List[str]]:
+        """Replace URLs, mentions and code with numbered placeholders"""
+        preserved = []
+        parts = []
+        for span in self.tokenize(text):
+            if span.kind in ('code', 'url', 'mention'):
+                parts.append(_PLACEHOLDER.format(len(preserved)))
+                preserved.append(span.text)
+            else:
+                parts.append(span.text)
+        return ''.join(parts), preserved
+
+    def unmask(self, text: str, preserved: List[str]) -> Optional[str]:
+        """Restore placeholders; None if the translation lost or invented any"""
+        found = [int(i) for i in _PLACEHOLDER_RE.findall(text)]
+        if sorted(found) != list(range(len(preserved))):
+            return None
+        return _PLACEHOLDER_RE.sub(lambda m: preserved[int(m.group(1))], text)
+
+    def record_skip(self, call: str, count: int = 1):
+        """Count AI calls avoided by the fast path"""
+        with self._lock:
+            self.skipped[call] += count
+
+    def stats(self) -> Dict:
+        """Skipped AI call counters"""
+        return {
+            'skipped_ai_calls': dict(self.skipped),
+            'total_skipped': sum(self.skipped.values())
+        }
+
+# Global preprocessor instance
+preprocessor = Preprocessor()
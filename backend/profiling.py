@@ -0,0 +1,271 @@
+"""Opt-in profiling for socket handlers and routes.
+
+Handler tracing records wall time, time spent in AI and database calls, and
+payload sizes per event, and logs a structured trace for events slower than
+SLOW_EVENT_THRESHOLD_MS. The sampling profiler periodically captures every
+thread's stack and aggregates them as collapsed stacks (the input format of
+flamegraph.pl and speedscope).
+"""
+from collections import Counter, deque
+from contextvars import ContextVar
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+from config import Config
+
+try:
+    # Sample from a real OS thread even when eventlet has patched threading
+    from eventlet.patcher import original
+    _threading = original('threading')
+    _time = original('time')
+except ImportError:
+    _threading = threading
+    _time = time
+
+logger = logging.getLogger(__name__)
+
+_current_trace = ContextVar('profiling_trace', default=None)
+
+# Spans kept per trace (timings beyond this are still added to the totals)
+_MAX_SPANS = 200
+
+def payload_size(payload) -> int:
+    """Approximate serialized size of a payload in bytes"""
+    try:
+        return len(json.dumps(payload, default=str, separators=(',', ':')).encode('utf-8'))
+    except (TypeError, ValueError):
+        return 0
+
+class Trace:
+    """Timings of one handled event"""
+
+    __slots__ = ('name', 'started', 'wall_ms', 'ai_ms', 'db_ms', 'ai_calls', 'db_calls', 'bytes_in', 'bytes_out', 'spans')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = time.perf_counter()
+        self.wall_ms = 0.0
+        self.ai_ms = 0.0
+        self.db_ms = 0.0
+        self.ai_calls = 0
+        self.db_calls = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.spans = []  # (category, name, start offset ms, duration ms)
+
+    def to_dict(self) -> Dict:
+        """Structured form of the trace for logging"""
+        return {
+            'event': self.name,
+            'wall_ms': round(self.wall_ms, 2),
+            'ai_ms': round(self.ai_ms, 2),
+            'db_ms': round(self.db_ms, 2),
+            'ai_calls': self.ai_calls,
+            'db_calls': self.db_calls,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'spans': [
+                {'category': category, 'name': name, 'start_ms': round(start, 2), 'duration_ms': round(duration, 2)}
+                for category, name, start, duration in self.spans
+            ]
+        }
+
+class span:
+    """Context manager timing an AI or database call into the current trace.
+
+    Concurrent calls (asyncio.gather) are each counted, so ai_ms and db_ms are
+    cumulative and may exceed the wall time.
+    """
+
+    __slots__ = ('category', 'name', 'trace', 'started')
+
+    def __init__(self, category: str, name: str):
+        self.category = category
+        self.name = name
+
+    def __enter__(self):
+        self.trace = _current_trace.get()
+        if self.trace is not None:
+            self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        trace = self.trace
+        if trace is None:
+            return False
+        ended = time.perf_counter()
+        duration = (ended - self.started) * 1000
+        if self.category == 'ai':
+            trace.ai_ms += duration
+            trace.ai_calls += 1
+        else:
+            trace.db_ms += duration
+            trace.db_calls += 1
+        if len(trace.spans) < _MAX_SPANS:
+            trace.spans.append((self.category, self.name, (self.started - trace.started) * 1000, duration))
+        return False
+
+def record_emit(payload):
+    """Count an emitted payload towards the current trace"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.bytes_out += payload_size(payload)
+
+class HandlerProfiler:
+    """Per-event timing statistics and the slow-event log"""
+
+    def __init__(self):
+        self.enabled = Config.PROFILE_HANDLERS
+        self._lock = threading.Lock()
+        self._stats = {}  # event -> [count, wall, ai, db, max wall, slow, bytes in, bytes out]
+        self.slow_events = deque(maxlen=50)
+
+    def record(self, trace: Trace):
+        """Aggregate a finished trace and log it if it was slow"""
+        with self._lock:
+            stats = self._stats.get(trace.name)
+            if stats is None:
+                stats = self._stats[trace.name] = [0, 0.0, 0.0, 0.0, 0.0, 0, 0, 0]
+            stats[0] += 1
+            stats[1] += trace.wall_ms
+            stats[2] += trace.ai_ms
+            stats[3] += trace.db_ms
+            stats[4] = max(stats[4], trace.wall_ms)
+            stats[6] += trace.bytes_in
+            stats[7] += trace.bytes_out
+            slow = trace.wall_ms >= Config.SLOW_EVENT_THRESHOLD_MS
+            if slow:
+                stats[5] += 1
+        if slow:
+            details = trace.to_dict()
+            self.slow_events.append(details)
+            logger.warning(f"Slow event {trace.name} took {trace.wall_ms:.0f} ms: {json.dumps(details)}")
+
+    def reset(self):
+        """Drop collected statistics"""
+        with self._lock:
+            self._stats.clear()
+            self.slow_events.clear()
+
+    def stats(self) -> Dict:
+        """Average and maximum timings per event"""
+        with self._lock:
+            return {
+                name: {
+                    'count': count,
+                    'avg_wall_ms': round(wall / count, 2),
+                    'avg_ai_ms': round(ai / count, 2),
+                    'avg_db_ms': round(db / count, 2),
+                    'max_wall_ms': round(max_wall, 2),
+                    'slow': slow,
+                    'avg_bytes_in': round(bytes_in / count),
+                    'avg_bytes_out': round(bytes_out / count)
+                }
+                for name, (count, wall, ai, db, max_wall, slow, bytes_in, bytes_out) in self._stats.items()
+            }
+
+def profiled(kind: str):
+    """Decorate an async socket handler ('socket') or route handler ('route') with tracing"""
+    def decorator(handler):
+        name = f"{kind}:{handler.__name__}"
+
+        @functools.wraps(handler)
+        async def wrapper(*args, **kwargs):
+            if not handler_profiler.enabled:
+                return await handler(*args, **kwargs)
+            trace = Trace(name)
+            # Socket handlers get (transport, data); route handlers get (query args, data)
+            if len(args) > 1:
+                trace.bytes_in = payload_size(args[1])
+            token = _current_trace.set(trace)
+            try:
+                result = await handler(*args, **kwargs)
+                if kind == 'route' and isinstance(result, tuple):
+                    trace.bytes_out += payload_size(result[0])
+                return result
+            finally:
+                _current_trace.reset(token)
+                trace.wall_ms = (time.perf_counter() - trace.started) * 1000
+                handler_profiler.record(trace)
+        return wrapper
+    return decorator
+
+class SamplingProfiler:
+    """Statistical profiler sampling all thread stacks from a background OS thread"""
+
+    def __init__(self):
+        self.interval = Config.PROFILER_SAMPLE_INTERVAL_MS / 1000
+        self.running = False
+        self._thread = None
+        self._lock = _threading.Lock()
+        self.stacks = Counter()  # collapsed stack -> samples
+        self.samples = 0
+        self.started_at = None
+
+    @staticmethod
+    def _collapse(frame) -> str:
+        """Collapsed stack for a frame, root first ('file:function;...')"""
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+    def _sample_loop(self):
+        """Capture stacks until stopped"""
+        own_id = _threading.get_ident()
+        while self.running:
+            frames = sys._current_frames()
+            collapsed = [self._collapse(frame) for thread_id, frame in frames.items() if thread_id != own_id]
+            with self._lock:
+                self.stacks.update(collapsed)
+                self.samples += 1
+            _time.sleep(self.interval)
+
+    def start(self):
+        """Start sampling (no-op if already running)"""
+        if self.running:
+            return
+        self.running = True
+        self.started_at = time.time()
+        self._thread = _threading.Thread(target=self._sample_loop, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        logger.info(f"Sampling profiler started ({self.interval * 1000:.0f} ms interval)")
+
+    def stop(self):
+        """Stop sampling; collected stacks are kept"""
+        if not self.running:
+            return
+        self.running = False
+        logger.info(f"Sampling profiler stopped after {self.samples} samples")
+
+    def reset(self):
+        """Drop collected stacks"""
+        with self._lock:
+            self.stacks.clear()
+            self.samples = 0
+
+    def collapsed(self, limit: Optional[int] = None) -> List[str]:
+        """Collected stacks as 'frame;frame;frame count' lines, most frequent first"""
+        with self._lock:
+            return [f"{stack} {count}" for stack, count in self.stacks.most_common(limit)]
+
+    def status(self) -> Dict:
+        """Profiler state"""
+        return {
+            'running': self.running,
+            'interval_ms': self.interval * 1000,
+            'samples': self.samples,
+            'distinct_stacks': len(self.stacks),
+            'started_at': self.started_at
+        }
+
+# Global profiler instances
+handler_profiler = HandlerProfiler()
+sampling_profiler = SamplingProfiler()
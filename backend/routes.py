@@ -1,173 +1,334 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 import logging
 from database import db
-from utils import generate_token, validate_username, validate_room_name
+from async_database import adb
+from cache import moderation_cache
+from preprocessor import preprocessor
+from translation_memory import translation_memory
+from message_log import message_log
+from search_index import search_index
+from profiling import profiled, handler_profiler, sampling_profiler
+from backpressure import backpressure
+from session_store import session_store
+from export import StreamingBody, ndjson_chunks, parse_time, parse_languages, export_filename
+from config import Config
+from utils import generate_token, validate_username, validate_room_name, run_async
 
 logger = logging.getLogger(__name__)
 
 api = Blueprint('api', __name__)
 
-@api.route('/auth/login', methods=['POST'])
-def login():
+# (path, methods, handler) for every API route, shared by the Flask blueprint
+# (eventlet mode) and the aiohttp application (asyncio mode)
+ROUTES = []
+
+def route(path, methods):
+    """Register an async handler as a blueprint view and as an asyncio-mode route.
+
+    Handlers receive the query args and JSON body (plus any path parameters)
+    and return a (body, status) tuple. A StreamingBody body is streamed
+    instead of being returned as JSON.
+    """
+    def decorator(handler):
+        handler = profiled('route')(handler)
+
+        def view(**kwargs):
+            body, status = run_async(handler(request.args, request.get_json(silent=True) or {}, **kwargs))
+            if isinstance(body, StreamingBody):
+                return Response(stream_with_context(body.chunks), status=status, content_type=body.content_type, headers=body.headers())
+            return jsonify(body), status
+        api.add_url_rule(path, handler.__name__, view, methods=methods)
+        ROUTES.append((path, methods, handler))
+        return handler
+    return decorator
+
+@route('/auth/login', methods=['POST'])
+async def login(args, data):
     """User authentication endpoint"""
     try:
-        data = request.get_json()
         username = data.get('username', '').strip()
         preferred_language = data.get('language', data.get('preferred_language', 'en'))
-        
+
         if not validate_username(username):
-            return jsonify({
+            return {
                 'error': 'Invalid username. Username must be 1-50 characters and contain only alphanumeric characters, spaces, underscores, or hyphens.'
-            }), 400
-        
+            }, 400
+
         # Get or create user
-        user = db.get_user(username=username)
+        user = await adb.get_user(username=username)
         if not user:
-            user = db.create_user(username, preferred_language)
+            user = await adb.create_user(username, preferred_language)
         else:
             # Update language if provided
             if preferred_language and preferred_language != user.get('preferred_language'):
                 user['preferred_language'] = preferred_language
                 if db.connected:
                     try:
-                        db.update_user_language(user['user_id'], preferred_language)
+                        await adb.update_user_language(user['user_id'], preferred_language)
                     except Exception as e:
                         logger.warning(f"Failed to update user language: {e}")
-        
-        # Generate session token
+
+        # Generate session token, remembered so sockets connecting with it are tied to the user
         token = generate_token()
-        
+        session_store.register_token(token, user['user_id'])
+
         logger.info(f"User logged in: {username}")
-        
-        return jsonify({
+
+        return {
             'userId': user['user_id'],  # Frontend expects userId
             'user_id': user['user_id'],  # Also include user_id for compatibility
             'username': user['username'],
             'token': token,
             'preferred_language': user.get('preferred_language', 'en')
-        }), 200
-        
+        }, 200
+
     except Exception as e:
         logger.error(f"Login error: {e}")
         import traceback
         traceback.print_exc()
-        return jsonify({'error': f'Internal server error: {str(e)}'}), 500
+        return {'error': f'Internal server error: {str(e)}'}, 500
 
-@api.route('/messages/<room_id>', methods=['GET'])
-def get_messages(room_id):
+@route('/messages/<room_id>', methods=['GET'])
+async def get_messages(args, data, room_id):
     """Get message history for a room (room_id can be room_id or room_name)"""
     try:
-        limit = request.args.get('limit', 50, type=int)
+        try:
+            limit = int(args.get('limit', 50))
+        except ValueError:
+            limit = 50
         if limit > 100:
             limit = 100  # Max limit
-        
+
         # Try to find room by ID first, then by name
-        room = db.get_room(room_id=room_id) or db.get_room(room_name=room_id)
+        room = await adb.get_room(room_id=room_id) or await adb.get_room(room_name=room_id)
         if not room:
             # If room doesn't exist, try to get or create 'general' if room_id is 'general'
             if room_id.lower() == 'general':
-                room = db.get_or_create_room('general')
+                room = await adb.get_or_create_room('general')
                 room_id = room['room_id']
             else:
-                return jsonify({'error': 'Room not found'}), 404
+                return {'error': 'Room not found'}, 404
         else:
             room_id = room['room_id']
-        
-        messages = db.get_messages(room_id, limit)
-        
-        return jsonify({
+
+        messages = await adb.get_messages(room_id, limit)
+
+        return {
             'messages': messages,
             'count': len(messages)
-        }), 200
-        
+        }, 200
+
     except Exception as e:
         logger.error(f"Get messages error: {e}")
-        return jsonify({'error': 'Internal server error'}), 500
+        return {'error': 'Internal server error'}, 500
 
-@api.route('/rooms', methods=['GET'])
-def get_rooms():
+@route('/messages/<room_id>/search', methods=['GET'])
+async def search_messages(args, data, room_id):
+    """Search a room's newest SEARCH_INDEX_MAX_MESSAGES messages and their translations (room_id can be room_id or room_name)"""
+    try:
+        query = args.get('q', '').strip()
+        if not query:
+            return {'error': 'Query parameter q is required'}, 400
+
+        try:
+            limit = int(args.get('limit', 20))
+        except ValueError:
+            limit = 20
+        limit = max(1, min(limit, 100))
+
+        room = await adb.get_room(room_id=room_id) or await adb.get_room(room_name=room_id)
+        if not room:
+            return {'error': 'Room not found'}, 404
+
+        try:
+            results, next_cursor = await search_index.search(room['room_id'], query, limit, args.get('cursor'))
+        except ValueError as e:
+            return {'error': str(e)}, 400
+
+        return {
+            'results': results,
+            'count': len(results),
+            'next_cursor': next_cursor
+        }, 200
+
+    except Exception as e:
+        logger.error(f"Search messages error: {e}")
+        return {'error': 'Internal server error'}, 500
+
+@route('/messages/<room_id>/export', methods=['GET'])
+async def export_messages(args, data, room_id):
+    """Stream a room's full history as NDJSON, optionally gzip-compressed (room_id can be room_id or room_name)"""
+    if not Config.EXPORT_ENABLED:
+        return {'error': 'Export is disabled'}, 404
+    try:
+        try:
+            start = parse_time(args.get('since'))
+            end = parse_time(args.get('until'))
+            languages = parse_languages(args.get('languages'))
+        except ValueError as e:
+            return {'error': f'Invalid parameter: {e}'}, 400
+        compress = args.get('gzip', '').lower() in ('1', 'true')
+
+        room = await adb.get_room(room_id=room_id) or await adb.get_room(room_name=room_id)
+        if not room:
+            return {'error': 'Room not found'}, 404
+
+        logger.info(f"Exporting room {room['room_name']} ({room['room_id']})")
+        messages = db.iter_messages(room['room_id'], start, end, languages)
+        content_type = 'application/gzip' if compress else 'application/x-ndjson; charset=utf-8'
+        return StreamingBody(
+            ndjson_chunks(messages, compress), content_type, export_filename(room['room_name'], compress)
+        ), 200
+
+    except Exception as e:
+        logger.error(f"Export messages error: {e}")
+        return {'error': 'Internal server error'}, 500
+
+@route('/rooms', methods=['GET'])
+async def get_rooms(args, data):
     """Get all available rooms"""
     try:
-        rooms = db.get_rooms()
-        
+        rooms = await adb.get_rooms()
+
         # If no rooms exist, create default 'general' room
         if not rooms:
-            general_room = db.create_room('general')
+            general_room = await adb.get_or_create_room('general')
+            if '_id' in general_room:
+                general_room['_id'] = str(general_room['_id'])
+            general_room['created_at'] = general_room['created_at'].isoformat()
             rooms = [general_room]
-        
-        return jsonify({
+
+        return {
             'rooms': rooms
-        }), 200
-        
+        }, 200
+
     except Exception as e:
         logger.error(f"Get rooms error: {e}")
-        return jsonify({'error': 'Internal server error'}), 500
+        return {'error': 'Internal server error'}, 500
 
-@api.route('/rooms', methods=['POST'])
-def create_room():
+@route('/rooms', methods=['POST'])
+async def create_room(args, data):
     """Create a new chat room"""
     try:
-        data = request.get_json()
         room_name = data.get('room_name', '').strip()
-        
+
         if not validate_room_name(room_name):
-            return jsonify({
+            return {
                 'error': 'Invalid room name. Room name must be 1-50 characters.'
-            }), 400
-        
+            }, 400
+
         # Check if room already exists
-        existing_rooms = db.get_rooms()
+        existing_rooms = await adb.get_rooms()
         if any(room['room_name'].lower() == room_name.lower() for room in existing_rooms):
-            return jsonify({
+            return {
                 'error': 'Room with this name already exists'
-            }), 400
-        
-        room = db.create_room(room_name)
+            }, 400
+
+        room = await adb.create_room(room_name)
         room['_id'] = str(room['_id'])
         room['created_at'] = room['created_at'].isoformat()
-        
+
         logger.info(f"Created room: {room_name}")
-        
-        return jsonify({
+
+        return {
             'room': room
-        }), 201
-        
+        }, 201
+
     except Exception as e:
         logger.error(f"Create room error: {e}")
-        return jsonify({'error': 'Internal server error'}), 500
+        return {'error': 'Internal server error'}, 500
 
-@api.route('/translate', methods=['POST'])
-def translate():
+@route('/translate', methods=['POST'])
+async def translate(args, data):
     """Manual translation endpoint"""
     try:
-        data = request.get_json()
         text = data.get('text', '')
         target_language = data.get('target_language', 'en')
         source_language = data.get('source_language', 'auto')
-        
+
         if not text:
-            return jsonify({'error': 'Text is required'}), 400
-        
+            return {'error': 'Text is required'}, 400
+
         # Import here to avoid circular imports
-        import asyncio
         from ai_service import ai_service
-        
-        # Run async translation
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        translated_text = loop.run_until_complete(
-            ai_service.translate_text(text, target_language, source_language)
-        )
-        loop.close()
-        
-        return jsonify({
+
+        translated_text = await ai_service.translate_text(text, target_language, source_language)
+
+        return {
             'original_text': text,
             'translated_text': translated_text,
             'source_language': source_language,
             'target_language': target_language
-        }), 200
-        
+        }, 200
+
     except Exception as e:
         logger.error(f"Translation error: {e}")
-        return jsonify({'error': 'Translation failed'}), 500
+        return {'error': 'Translation failed'}, 500
+
+@route('/profiling', methods=['GET', 'POST'])
+async def profiling(args, data):
+    """Handler timings and slow events; POST toggles tracing and the sampling profiler"""
+    if not Config.PROFILING_ENABLED:
+        return {'error': 'Profiling is disabled'}, 404
+    try:
+        if 'tracing' in data:
+            handler_profiler.enabled = bool(data['tracing'])
+        if 'sampling' in data:
+            if data['sampling']:
+                sampling_profiler.start()
+            else:
+                sampling_profiler.stop()
+        if data.get('reset'):
+            handler_profiler.reset()
+            sampling_profiler.reset()
+
+        return {
+            'tracing': handler_profiler.enabled,
+            'slow_event_threshold_ms': Config.SLOW_EVENT_THRESHOLD_MS,
+            'handlers': handler_profiler.stats(),
+            'slow_events': list(handler_profiler.slow_events),
+            'sampling': sampling_profiler.status()
+        }, 200
+
+    except Exception as e:
+        logger.error(f"Profiling error: {e}")
+        return {'error': 'Internal server error'}, 500
 
+@route('/profiling/stacks', methods=['GET'])
+async def profiling_stacks(args, data):
+    """Sampled stacks in collapsed format ('frame;frame;frame count' per line)"""
+    if not Config.PROFILING_ENABLED:
+        return {'error': 'Profiling is disabled'}, 404
+    try:
+        try:
+            limit = int(args.get('limit', 0)) or None
+        except ValueError:
+            limit = None
+        return {
+            'format': 'collapsed',
+            'samples': sampling_profiler.samples,
+            'stacks': sampling_profiler.collapsed(limit)
+        }, 200
+
+    except Exception as e:
+        logger.error(f"Profiling stacks error: {e}")
+        return {'error': 'Internal server error'}, 500
+
+@route('/metrics', methods=['GET'])
+async def metrics(args, data):
+    """Runtime cache and pipeline metrics"""
+    try:
+        return {
+            'moderation_cache': moderation_cache.stats(),
+            'preprocessor': preprocessor.stats(),
+            'translation_memory': translation_memory.stats(),
+            'message_log': message_log.stats(),
+            'search_index': search_index.stats(),
+            'sessions': session_store.stats(),
+            'outbound': backpressure.stats(),
+            'database': adb.stats()
+        }, 200
+
+    except Exception as e:
+        logger.error(f"Metrics error: {e}")
+        return {'error': 'Internal server error'}, 500
@@ -0,0 +1,251 @@
+from collections import Counter, OrderedDict
+import base64
+import json
+import logging
+import math
+import queue
+import re
+import threading
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+from config import Config
+from async_database import adb
+from wire import to_epoch_ms
+
+logger = logging.getLogger(__name__)
+
+# Runs of Han ideographs and kana (scripts written without spaces) are indexed
+# as overlapping character bigrams; everything else as whole words
+_CJK_RE = re.compile('[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+')
+_WORD_RE = re.compile(r'\w+')
+
+# BM25 parameters
+_K1 = 1.2
+_B = 0.75
+
+def _fold(text: str) -> str:
+    """NFKC-normalize, casefold and strip accents so variants compare equal"""
+    text = unicodedata.normalize('NFKC', text).casefold()
+    decomposed = unicodedata.normalize('NFD', text)
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return unicodedata.normalize('NFC', stripped)
+
+def tokenize(text: str) -> List[str]:
+    """Split text into search tokens (words, or character bigrams for CJK)"""
+    tokens = []
+    for word in _WORD_RE.findall(_fold(text)):
+        pos = 0
+        for match in _CJK_RE.finditer(word):
+            if match.start() > pos:
+                tokens.append(word[pos:match.start()])
+            run = match.group()
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+            pos = match.end()
+        if pos < len(word):
+            tokens.append(word[pos:])
+    return tokens
+
+def message_tokens(message: Dict) -> Counter:
+    """Term frequencies over a message's original text and all its translations"""
+    texts = {message.get('original_text') or ''}
+    texts.update(text for text in (message.get('translations') or {}).values() if text)
+    counts = Counter()
+    for text in texts:
+        counts.update(tokenize(text))
+    return counts
+
+def encode_cursor(key: Tuple) -> str:
+    """Opaque pagination cursor for a result sort key"""
+    return base64.urlsafe_b64encode(json.dumps(key).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor: str) -> Optional[Tuple]:
+    """Sort key from a pagination cursor; None if it is malformed"""
+    try:
+        score, timestamp, message_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return (float(score), int(timestamp), str(message_id))
+    except Exception:
+        return None
+
+class RoomIndex:
+    """Inverted index over one room's recent messages"""
+
+    __slots__ = ('messages', 'terms', 'lengths', 'postings', 'total_length', 'backfilled')
+
+    def __init__(self):
+        self.messages = OrderedDict()  # message_id -> message (oldest first)
+        self.terms = {}  # message_id -> Counter of tokens
+        self.lengths = {}  # message_id -> token count
+        self.postings = {}  # token -> {message_id: term frequency}
+        self.total_length = 0
+        self.backfilled = False
+
+    def add(self, message: Dict):
+        """Index a message (no-op if already indexed)"""
+        message_id = message['message_id']
+        if message_id in self.messages:
+            return
+        counts = message_tokens(message)
+        self.messages[message_id] = message
+        self.terms[message_id] = counts
+        self.lengths[message_id] = sum(counts.values())
+        self.total_length += self.lengths[message_id]
+        for token, count in counts.items():
+            self.postings.setdefault(token, {})[message_id] = count
+
+    def evict_oldest(self):
+        """Drop the oldest indexed message"""
+        message_id, _ = self.messages.popitem(last=False)
+        counts = self.terms.pop(message_id)
+        self.total_length -= self.lengths.pop(message_id)
+        for token in counts:
+            posting = self.postings[token]
+            del posting[message_id]
+            if not posting:
+                del self.postings[token]
+
+    def score(self, query_tokens: List[str]) -> Dict[str, float]:
+        """BM25 score of every message matching any query token"""
+        count = len(self.messages)
+        if not count:
+            return {}
+        avg_length = self.total_length / count
+        scores = {}
+        for token in set(query_tokens):
+            posting = self.postings.get(token)
+            if not posting:
+                continue
+            idf = math.log(1 + (count - len(posting) + 0.5) / (len(posting) + 0.5))
+            for message_id, tf in posting.items():
+                length = self.lengths[message_id]
+                norm = tf * (_K1 + 1) / (tf + _K1 * (1 - _B + _B * length / avg_length))
+                scores[message_id] = scores.get(message_id, 0.0) + idf * norm
+        return scores
+
+class SearchIndex:
+    """In-process inverted index for message search, maintained off the send path.
+
+    New messages are queued and indexed by a background worker. A room's
+    earlier history is loaded from the database on its first search.
+    """
+
+    def __init__(self, max_messages: int, queue_size: int):
+        self.max_messages = max_messages
+        self.rooms = {}  # room_id -> RoomIndex
+        self._lock = threading.RLock()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._worker = None
+        self.indexed = 0
+        self.dropped = 0
+        self.searches = 0
+
+    def _room(self, room_id: str) -> RoomIndex:
+        """Index for a room, created on first use"""
+        index = self.rooms.get(room_id)
+        if index is None:
+            index = self.rooms[room_id] = RoomIndex()
+        return index
+
+    def _index(self, message: Dict):
+        """Add a message to its room's index, evicting the oldest beyond the size limit"""
+        with self._lock:
+            index = self._room(message['room_id'])
+            index.add(message)
+            while len(index.messages) > self.max_messages:
+                index.evict_oldest()
+            self.indexed += 1
+
+    def _work(self):
+        """Index queued messages"""
+        while True:
+            message = self._queue.get()
+            try:
+                self._index(message)
+            except Exception as e:
+                logger.error(f"Failed to index message {message.get('message_id')}: {e}")
+
+    def add(self, message: Dict):
+        """Queue a message for indexing; never blocks (drops it when the queue is full)"""
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._work, name='search-indexer', daemon=True)
+            self._worker.start()
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            self.dropped += 1
+            logger.warning(f"Search index queue full, message {message['message_id']} not indexed")
+
+    async def _backfill(self, room_id: str):
+        """Index a room's stored history the first time it is searched (retried on the next search if the read fails)"""
+        with self._lock:
+            if self._room(room_id).backfilled:
+                return
+        try:
+            history = await adb.get_messages(room_id, self.max_messages, strict=True)
+        except Exception as e:
+            logger.warning(f"Could not load stored messages for room {room_id}, searching indexed messages only: {e}")
+            return
+        with self._lock:
+            index = self._room(room_id)
+            if index.backfilled:
+                return
+            # History is oldest first; keep already indexed newer messages at the end
+            newer = list(index.messages.values())
+            rebuilt = RoomIndex()
+            for message in history + newer:
+                message = {key: value for key, value in message.items() if key != '_id'}
+                rebuilt.add(message)
+            while len(rebuilt.messages) > self.max_messages:
+                rebuilt.evict_oldest()
+            rebuilt.backfilled = True
+            self.rooms[room_id] = rebuilt
+        logger.info(f"Indexed {len(history)} stored messages for room {room_id}")
+
+    async def search(self, room_id: str, query: str, limit: int = 20, cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """Ranked messages matching query; returns (results, next_cursor). Raises ValueError for a bad cursor"""
+        after = None
+        if cursor:
+            after = decode_cursor(cursor)
+            if after is None:
+                raise ValueError('Invalid cursor')
+        query_tokens = tokenize(query)
+        if not query_tokens:
+            return [], None
+        await self._backfill(room_id)
+
+        with self._lock:
+            self.searches += 1
+            index = self._room(room_id)
+            ranked = []
+            for message_id, score in index.score(query_tokens).items():
+                message = index.messages[message_id]
+                # Best score first, then newest first
+                key = (round(score, 6), to_epoch_ms(message['timestamp']), message_id)
+                sort_key = (-key[0], -key[1], key[2])
+                if after and sort_key <= (-after[0], -after[1], after[2]):
+                    continue
+                ranked.append((sort_key, key, message))
+
+        ranked.sort(key=lambda entry: entry[0])
+        page = ranked[:limit]
+        results = [dict(message, score=key[0]) for _, key, message in page]
+        next_cursor = encode_cursor(page[-1][1]) if len(ranked) > limit else None
+        return results, next_cursor
+
+    def stats(self) -> Dict:
+        """Index size and queue statistics"""
+        with self._lock:
+            return {
+                'rooms': len(self.rooms),
+                'messages': sum(len(index.messages) for index in self.rooms.values()),
+                'terms': sum(len(index.postings) for index in self.rooms.values()),
+                'indexed': self.indexed,
+                'queued': self._queue.qsize(),
+                'dropped': self.dropped,
+                'searches': self.searches
+            }
+
+# Global search index instance
+search_index = SearchIndex(Config.SEARCH_INDEX_MAX_MESSAGES, Config.SEARCH_INDEX_QUEUE_SIZE)
@@ -0,0 +1,175 @@
+from collections import OrderedDict
+import logging
+import sys
+from typing import Dict, Optional, Set
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_EMPTY = frozenset()
+
+class Session:
+    """One connected socket's user and room memberships"""
+
+    __slots__ = ('sid', 'user_id', 'username', 'preferred_language', 'rooms', 'token')
+
+    def __init__(self, sid: str, user_id: str, username: str, preferred_language: str, token: Optional[str] = None):
+        self.sid = sid
+        self.user_id = sys.intern(user_id)
+        self.username = username
+        self.preferred_language = sys.intern(preferred_language)
+        self.rooms = set()  # interned room ids
+        self.token = token
+
+    def to_dict(self) -> Dict:
+        """Public view of the session"""
+        return {
+            'socket_id': self.sid,
+            'user_id': self.user_id,
+            'username': self.username,
+            'preferred_language': self.preferred_language,
+            'rooms': sorted(self.rooms)
+        }
+
+class SessionStore:
+    """Connected sockets, room membership and a user -> sockets index.
+
+    Room ids, user ids and language codes are interned so the thousands of
+    sessions sharing them hold references to one string each. Login tokens map
+    to user ids so sockets connecting with a token are tied to their user
+    before they join a room.
+    """
+
+    def __init__(self, token_limit: int):
+        self.sessions = {}  # sid -> Session
+        self.room_members = {}  # room_id -> set of sids
+        self.user_sockets = {}  # user_id -> set of sids
+        self.tokens = OrderedDict()  # login token -> user_id (oldest first)
+        self.token_limit = token_limit
+
+    def get(self, sid: str) -> Optional[Session]:
+        """Session for a socket, if it has identified itself"""
+        return self.sessions.get(sid)
+
+    def attach(self, sid: str, user_id: str, username: str, preferred_language: Optional[str] = None,
+               token: Optional[str] = None) -> Session:
+        """Create or update the session of a socket (moving it to user_id if it belonged to another user)"""
+        session = self.sessions.get(sid)
+        if session is None:
+            session = Session(sid, user_id, username, preferred_language or 'en', token)
+            self.sessions[sid] = session
+            self.user_sockets.setdefault(session.user_id, set()).add(sid)
+            return session
+        if session.user_id != user_id:
+            self._discard_user_socket(session.user_id, sid)
+            session.user_id = sys.intern(user_id)
+            session.username = username
+            session.token = None  # issued to the previous user
+            self.user_sockets.setdefault(session.user_id, set()).add(sid)
+        if preferred_language:
+            session.preferred_language = sys.intern(preferred_language)
+        if token:
+            session.token = token
+        return session
+
+    def join(self, sid: str, room_id: str) -> bool:
+        """Add a socket's session to a room; returns True if it was not a member yet"""
+        session = self.sessions[sid]
+        room_id = sys.intern(room_id)
+        if room_id in session.rooms:
+            return False
+        session.rooms.add(room_id)
+        self.room_members.setdefault(room_id, set()).add(sid)
+        return True
+
+    def leave(self, sid: str, room_id: str) -> bool:
+        """Remove a socket's session from a room; returns True if it was a member"""
+        session = self.sessions.get(sid)
+        if session is None or room_id not in session.rooms:
+            return False
+        session.rooms.discard(room_id)
+        self._discard_member(room_id, sid)
+        return True
+
+    def remove(self, sid: str) -> Optional[Session]:
+        """Drop a disconnected socket's session; returns it (with its rooms) if there was one"""
+        session = self.sessions.pop(sid, None)
+        if session is None:
+            return None
+        for room_id in session.rooms:
+            self._discard_member(room_id, sid)
+        self._discard_user_socket(session.user_id, sid)
+        return session
+
+    def _discard_user_socket(self, user_id: str, sid: str):
+        """Remove a sid from a user's sockets, dropping the user when none are left"""
+        sockets = self.user_sockets.get(user_id)
+        if sockets is not None:
+            sockets.discard(sid)
+            if not sockets:
+                del self.user_sockets[user_id]
+
+    def move_room(self, room_id: str, new_room_id: str) -> Set[str]:
+        """Move a room's members to another room id; returns the sids moved"""
+        members = self.room_members.pop(room_id, set())
+        new_room_id = sys.intern(new_room_id)
+        for sid in members:
+            session = self.sessions.get(sid)
+            if session is not None:
+                session.rooms.discard(room_id)
+                session.rooms.add(new_room_id)
+        if members:
+            self.room_members.setdefault(new_room_id, set()).update(members)
+        return members
+
+    def _discard_member(self, room_id: str, sid: str):
+        """Remove a sid from a room's members, dropping the room when it empties"""
+        members = self.room_members.get(room_id)
+        if members is not None:
+            members.discard(sid)
+            if not members:
+                del self.room_members[room_id]
+
+    def in_room(self, sid: str, room_id: str) -> bool:
+        """Whether a socket has joined a room"""
+        session = self.sessions.get(sid)
+        return session is not None and room_id in session.rooms
+
+    def user_in_room(self, user_id: str, room_id: str, exclude_sid: Optional[str] = None) -> bool:
+        """Whether any of a user's sockets (other than exclude_sid) is in a room"""
+        members = self.room_members.get(room_id, _EMPTY)
+        return any(sid != exclude_sid and sid in members for sid in self.user_sockets.get(user_id, _EMPTY))
+
+    def room_languages(self, room_id: str) -> Set[str]:
+        """Preferred languages of a room's members"""
+        sessions = self.sessions
+        return {sessions[sid].preferred_language for sid in self.room_members.get(room_id, _EMPTY) if sid in sessions}
+
+    def sockets_for_user(self, user_id: str) -> Set[str]:
+        """Sids of a user's connected sockets (one per tab)"""
+        return set(self.user_sockets.get(user_id, _EMPTY))
+
+    def register_token(self, token: str, user_id: str):
+        """Remember which user a login token was issued to, forgetting the oldest beyond the limit"""
+        self.tokens[token] = sys.intern(user_id)
+        while len(self.tokens) > self.token_limit:
+            self.tokens.popitem(last=False)
+
+    def user_for_token(self, token: Optional[str]) -> Optional[str]:
+        """User id a login token was issued to"""
+        return self.tokens.get(token) if token else None
+
+    def stats(self) -> Dict:
+        """Connection and membership counts"""
+        return {
+            'sockets': len(self.sessions),
+            'users': len(self.user_sockets),
+            'multi_socket_users': sum(1 for sockets in self.user_sockets.values() if len(sockets) > 1),
+            'rooms': len(self.room_members),
+            'memberships': sum(len(members) for members in self.room_members.values()),
+            'authenticated_sockets': sum(1 for session in self.sessions.values() if session.token),
+            'tokens': len(self.tokens)
+        }
+
+# Global session store instance
+session_store = SessionStore(Config.SESSION_TOKEN_LIMIT)
@@ -1,266 +1,517 @@
 from flask import request
-from flask_socketio import emit, join_room, leave_room
 import logging
 import asyncio
-from database import db
+import time
+from config import Config
+from async_database import adb
 from ai_service import ai_service
+from message_log import message_log
+from search_index import search_index
+from profiling import profiled, record_emit
+from backpressure import backpressure
+from session_store import session_store
 from rate_limiter import rate_limiter
+from utils import run_async
+from wire import outbound_message
+import startup
 
 logger = logging.getLogger(__name__)
 
-# Store active users and their rooms
-active_users = {}  # socket_id -> {user_id, username, preferred_language, rooms: []}
-room_users = {}  # room_id -> set of socket_ids
+pending_leaves = {}  # (user_id, room_id) -> token of the user_left broadcast waiting out the grace period
 
-def register_socket_handlers(socketio):
-    """Register all Socket.IO event handlers"""
-    
-    @socketio.on('connect')
-    def handle_connect(auth):
-        """Handle client connection"""
-        logger.info(f"Client connected: {request.sid}")
-        emit('connected', {'status': 'connected', 'socket_id': request.sid})
+class SocketTransport:
+    """Socket.IO operations for one event under Flask-SocketIO (eventlet mode)"""
+
+    def __init__(self, socketio, sid):
+        self.socketio = socketio
+        self.sid = sid
+
+    async def emit(self, event, data, room=None, include_self=True):
+        """Emit to this socket, or to a room when given (holding back slow sockets)"""
+        record_emit(data)
+        if not room:
+            self.socketio.emit(event, data, to=self.sid)
+            return
+        server = self.socketio.server
+        plan = backpressure.plan(server, event, data, room, None if include_self else self.sid)
+        started = time.perf_counter()
+        for sid, pending_event, pending_data in plan.deliveries:
+            self.socketio.emit(pending_event, pending_data, to=sid)
+        self.socketio.emit(event, data, to=room, skip_sid=plan.skip or None)
+        backpressure.record_fanout(room, data, plan.recipients, plan.skipped, time.perf_counter() - started)
+        for sid in plan.disconnect:
+            # Not inline: the disconnect handler would wait on the event loop running this coroutine
+            self.socketio.start_background_task(server.disconnect, sid, namespace='/')
+
+    async def join(self, room_id):
+        """Add this socket to a room"""
+        self.socketio.server.enter_room(self.sid, room_id, namespace='/')
+
+    async def leave(self, room_id):
+        """Remove this socket from a room"""
+        self.socketio.server.leave_room(self.sid, room_id, namespace='/')
+
+    async def call_later(self, delay, handler, *args):
+        """Run a handler coroutine after delay seconds in a background task"""
+        def run():
+            self.socketio.sleep(delay)
+            run_async(handler(*args))
+        self.socketio.start_background_task(run)
+
+class AsyncSocketTransport:
+    """Socket.IO operations for one event under python-socketio's AsyncServer (asyncio mode)"""
+
+    def __init__(self, sio, sid):
+        self.sio = sio
+        self.sid = sid
+
+    async def emit(self, event, data, room=None, include_self=True):
+        """Emit to this socket, or to a room when given (holding back slow sockets)"""
+        record_emit(data)
+        if not room:
+            await self.sio.emit(event, data, to=self.sid)
+            return
+        plan = backpressure.plan(self.sio, event, data, room, None if include_self else self.sid)
+        started = time.perf_counter()
+        for sid, pending_event, pending_data in plan.deliveries:
+            await self.sio.emit(pending_event, pending_data, to=sid)
+        await self.sio.emit(event, data, to=room, skip_sid=plan.skip or None)
+        backpressure.record_fanout(room, data, plan.recipients, plan.skipped, time.perf_counter() - started)
+        for sid in plan.disconnect:
+            await self.sio.disconnect(sid)
+
+    async def join(self, room_id):
+        """Add this socket to a room"""
+        await self.sio.enter_room(self.sid, room_id)
+
+    async def leave(self, room_id):
+        """Remove this socket from a room"""
+        await self.sio.leave_room(self.sid, room_id)
+
+    async def call_later(self, delay, handler, *args):
+        """Run a handler coroutine after delay seconds in a background task"""
+        async def run():
+            await self.sio.sleep(delay)
+            await handler(*args)
+        self.sio.start_background_task(run)
+
+def _joined_room_id(session, room_id):
+    """Id under which a socket joined a room, accepting the local id of a room merged on replay; None if not joined"""
+    canonical = adb.database.canonical_room_id(room_id)
+    if canonical in session.rooms:
+        return canonical
+    return room_id if room_id in session.rooms else None
+
+async def move_merged_rooms(moved, make_transport):
+    """Move sockets, sessions and recent messages from local room ids to the MongoDB rooms they were merged into"""
+    for room_id, mongo_id in moved.items():
+        for sid in session_store.move_room(room_id, mongo_id):
+            transport = make_transport(sid)
+            await transport.join(mongo_id)
+            await transport.leave(room_id)
+        message_log.move_room(room_id, mongo_id)
+        for key in [key for key in pending_leaves if key[1] == room_id]:
+            pending_leaves[(key[0], mongo_id)] = pending_leaves.pop(key)
+        logger.info(f"Moved live state of room {room_id} to merged room {mongo_id}")
+
+def _track_membership(socket_id, user_id, username, preferred_language, room_id):
+    """Record that a socket's user is in a room; returns True if none of the user's sockets was in it yet"""
+    first = not session_store.user_in_room(user_id, room_id)
+    session_store.attach(socket_id, user_id, username, preferred_language)
+    session_store.join(socket_id, room_id)
+    return first
+
+async def announce_user_left(transport, token, username, user_id, room_id):
+    """Broadcast user_left unless the user resumed or rejoined during the grace period"""
+    if pending_leaves.get((user_id, room_id)) is not token:
+        return
+    del pending_leaves[(user_id, room_id)]
+    await transport.emit('user_left', {
+        'username': username,
+        'room_id': room_id
+    }, room=room_id)
+
+async def missed_messages(room_id, last_message_id):
+    """Messages a reconnecting client missed; returns (messages, reset).
     
-    @socketio.on('disconnect')
-    def handle_disconnect():
-        """Handle client disconnection"""
-        socket_id = request.sid
-        if socket_id in active_users:
-            user_info = active_users[socket_id]
-            # Leave all rooms
-            for room_id in user_info.get('rooms', []):
-                if room_id in room_users:
-                    room_users[room_id].discard(socket_id)
-                    if not room_users[room_id]:
-                        del room_users[room_id]
-                emit('user_left', {
-                    'username': user_info['username'],
+    reset is True when the gap could not be replayed (unknown last-seen id or
+    more than RESUME_MAX_MESSAGES) and messages is the latest history instead.
+    """
+    if not last_message_id:
+        return [], False
+    missed = message_log.since(room_id, last_message_id)
+    if missed is None:
+        missed = await adb.get_messages_since(room_id, last_message_id, Config.RESUME_MAX_MESSAGES + 1)
+    if missed is not None and len(missed) <= Config.RESUME_MAX_MESSAGES:
+        return missed, False
+    latest = await adb.get_messages(room_id, Config.RESUME_MAX_MESSAGES)
+    return latest, bool(latest)
+
+@profiled('socket')
+async def handle_connect(transport, auth=None):
+    """Handle client connection"""
+    logger.info(f"Client connected: {transport.sid}")
+    startup.mark('first_connection')
+    # Tie the socket to its user when it connects with a login token
+    token = auth.get('token') if isinstance(auth, dict) else None
+    user_id = session_store.user_for_token(token)
+    if user_id:
+        session_store.attach(transport.sid, user_id, auth.get('username') or user_id, token=token)
+    await transport.emit('connected', {'status': 'connected', 'socket_id': transport.sid})
+
+@profiled('socket')
+async def handle_disconnect(transport, reason=None):
+    """Handle client disconnection"""
+    socket_id = transport.sid
+    backpressure.forget(socket_id)
+    session = session_store.remove(socket_id)
+    if session is not None:
+        # Leave all rooms
+        for room_id in session.rooms:
+            if session_store.user_in_room(session.user_id, room_id):
+                continue  # Still there from another tab
+            if Config.PRESENCE_GRACE_PERIOD > 0:
+                # Announce the leave only if the user doesn't resume in time
+                token = object()
+                pending_leaves[(session.user_id, room_id)] = token
+                await transport.call_later(
+                    Config.PRESENCE_GRACE_PERIOD, announce_user_left,
+                    transport, token, session.username, session.user_id, room_id
+                )
+            else:
+                await transport.emit('user_left', {
+                    'username': session.username,
                     'room_id': room_id
                 }, room=room_id, include_self=False)
-            
-            logger.info(f"User {user_info['username']} disconnected")
-            del active_users[socket_id]
-    
-    @socketio.on('join_room')
-    def handle_join_room(data):
-        """Handle user joining a room"""
-        try:
-            socket_id = request.sid
-            user_id = data.get('user_id')
-            username = data.get('username')
-            room_identifier = data.get('room_id', 'general')  # Can be room_id or room_name
-            preferred_language = data.get('preferred_language', 'en')
-            
-            if not user_id or not username:
-                emit('error', {'message': 'user_id and username are required'})
+
+        logger.info(f"User {session.username} disconnected")
+
+@profiled('socket')
+async def handle_join_room(transport, data):
+    """Handle user joining a room"""
+    try:
+        socket_id = transport.sid
+        user_id = data.get('user_id')
+        username = data.get('username')
+        room_identifier = data.get('room_id', 'general')  # Can be room_id or room_name
+        preferred_language = data.get('preferred_language', 'en')
+
+        if not user_id or not username:
+            await transport.emit('error', {'message': 'user_id and username are required'})
+            return
+
+        # Resolve room identifier to room_id
+        room = await adb.get_room(room_id=room_identifier) or await adb.get_room(room_name=room_identifier)
+        if not room:
+            # If room doesn't exist, create it if it's 'general', otherwise error
+            if room_identifier.lower() == 'general':
+                room = await adb.get_or_create_room('general')
+            else:
+                await transport.emit('error', {'message': f'Room "{room_identifier}" not found'})
                 return
-            
-            # Resolve room identifier to room_id
-            room = db.get_room(room_id=room_identifier) or db.get_room(room_name=room_identifier)
+
+        room_id = room['room_id']
+        room_name = room['room_name']
+
+        # Join the room (using room_id for Socket.IO room management)
+        await transport.join(room_id)
+
+        # Store user info and track room membership
+        first = _track_membership(socket_id, user_id, username, preferred_language, room_id)
+
+        logger.info(f"User {username} joined room {room_name} ({room_id})")
+
+        await transport.emit('joined_room', {
+            'room_id': room_id,
+            'room_name': room_name,
+            'username': username
+        })
+
+        # Notify others in the room, unless this is a rejoin within the grace period or another tab is there
+        if pending_leaves.pop((user_id, room_id), None) is None and first:
+            await transport.emit('user_joined', {
+                'username': username,
+                'room_id': room_id,
+                'room_name': room_name
+            }, room=room_id, include_self=False)
+
+    except Exception as e:
+        logger.error(f"Join room error: {e}")
+        await transport.emit('error', {'message': 'Failed to join room'})
+
+@profiled('socket')
+async def handle_resume(transport, data):
+    """Handle a reconnecting client: restore room memberships and replay missed messages in one reply"""
+    try:
+        socket_id = transport.sid
+        user_id = data.get('user_id')
+        username = data.get('username')
+        preferred_language = data.get('preferred_language', 'en')
+
+        if not user_id or not username:
+            await transport.emit('error', {'message': 'user_id and username are required'})
+            return
+
+        resumed = []
+        for entry in data.get('rooms', []):
+            room_identifier = entry.get('room_id')  # Can be room_id or room_name
+            room = None
+            if room_identifier:
+                room = await adb.get_room(room_id=room_identifier) or await adb.get_room(room_name=room_identifier)
             if not room:
-                # If room doesn't exist, create it if it's 'general', otherwise error
-                if room_identifier.lower() == 'general':
-                    room = db.get_or_create_room('general')
-                else:
-                    emit('error', {'message': f'Room "{room_identifier}" not found'})
-                    return
-            
+                resumed.append({'room_id': room_identifier, 'error': 'Room not found'})
+                continue
             room_id = room['room_id']
-            room_name = room['room_name']
-            
-            # Store user info
-            if socket_id not in active_users:
-                active_users[socket_id] = {
-                    'user_id': user_id,
+
+            await transport.join(room_id)
+            first = _track_membership(socket_id, user_id, username, preferred_language, room_id)
+            messages, reset = await missed_messages(room_id, entry.get('last_message_id'))
+
+            if pending_leaves.pop((user_id, room_id), None) is None and first:
+                await transport.emit('user_joined', {
                     'username': username,
-                    'preferred_language': preferred_language,
-                    'rooms': []
-                }
-            else:
-                active_users[socket_id]['preferred_language'] = preferred_language
-            
-            # Join the room (using room_id for Socket.IO room management)
-            join_room(room_id)
-            
-            # Track room membership
-            if room_id not in active_users[socket_id]['rooms']:
-                active_users[socket_id]['rooms'].append(room_id)
-            
-            if room_id not in room_users:
-                room_users[room_id] = set()
-            room_users[room_id].add(socket_id)
-            
-            logger.info(f"User {username} joined room {room_name} ({room_id})")
-            
-            emit('joined_room', {
+                    'room_id': room_id,
+                    'room_name': room['room_name']
+                }, room=room_id, include_self=False)
+
+            resumed.append({
                 'room_id': room_id,
-                'room_name': room_name,
-                'username': username
+                'room_name': room['room_name'],
+                'messages': [outbound_message(message) for message in messages],
+                'reset': reset
             })
-            
-            # Notify others in the room
-            emit('user_joined', {
-                'username': username,
-                'room_id': room_id,
-                'room_name': room_name
-            }, room=room_id, include_self=False)
-            
-        except Exception as e:
-            logger.error(f"Join room error: {e}")
-            emit('error', {'message': 'Failed to join room'})
-    
-    @socketio.on('leave_room')
-    def handle_leave_room(data):
-        """Handle user leaving a room"""
-        try:
-            socket_id = request.sid
-            room_id = data.get('room_id', 'general')
-            
-            if socket_id in active_users:
-                user_info = active_users[socket_id]
-                
-                # Remove from room tracking
-                if room_id in user_info.get('rooms', []):
-                    user_info['rooms'].remove(room_id)
-                
-                if room_id in room_users:
-                    room_users[room_id].discard(socket_id)
-                    if not room_users[room_id]:
-                        del room_users[room_id]
-                
-                leave_room(room_id)
-                
-                logger.info(f"User {user_info['username']} left room {room_id}")
-                
-                emit('left_room', {'room_id': room_id})
-                
-                # Notify others in the room
-                emit('user_left', {
-                    'username': user_info['username'],
+
+        logger.info(f"User {username} resumed {len(resumed)} room(s)")
+        await transport.emit('resumed', {'rooms': resumed})
+
+    except Exception as e:
+        logger.error(f"Resume error: {e}")
+        await transport.emit('error', {'message': 'Failed to resume session'})
+
+@profiled('socket')
+async def handle_leave_room(transport, data):
+    """Handle user leaving a room"""
+    try:
+        socket_id = transport.sid
+        room_id = data.get('room_id', 'general')
+
+        session = session_store.get(socket_id)
+        if session is not None:
+            room_id = _joined_room_id(session, room_id) or room_id
+
+            # Remove from room tracking
+            session_store.leave(socket_id, room_id)
+
+            await transport.leave(room_id)
+
+            logger.info(f"User {session.username} left room {room_id}")
+
+            await transport.emit('left_room', {'room_id': room_id})
+
+            # Notify others in the room, unless the user is still there from another tab
+            if not session_store.user_in_room(session.user_id, room_id):
+                await transport.emit('user_left', {
+                    'username': session.username,
                     'room_id': room_id
                 }, room=room_id, include_self=False)
-            
-        except Exception as e:
-            logger.error(f"Leave room error: {e}")
-            emit('error', {'message': 'Failed to leave room'})
-    
-    @socketio.on('send_message')
-    def handle_send_message(data):
-        """Handle sending a message"""
-        try:
-            socket_id = request.sid
-            
-            if socket_id not in active_users:
-                emit('error', {'message': 'Not authenticated. Please join a room first.'})
-                return
-            
-            user_info = active_users[socket_id]
-            user_id = user_info['user_id']
-            username = user_info['username']
-            room_id = data.get('room_id', 'general')
-            text = data.get('text', '').strip()
-            
-            if not text:
-                emit('error', {'message': 'Message text cannot be empty'})
-                return
-            
-            # Check rate limit
-            allowed, message = rate_limiter.is_allowed(user_id)
-            if not allowed:
-                emit('error', {'message': message})
-                return
-            
-            # Verify user is in the room
-            if room_id not in user_info.get('rooms', []):
-                emit('error', {'message': 'You are not in this room'})
-                return
-            
-            # Run async operations
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            
-            # Detect language and moderate content
-            source_language = loop.run_until_complete(ai_service.detect_language(text))
-            moderation_result = loop.run_until_complete(ai_service.moderate_content(text))
-            
-            # Get all users in the room and their preferred languages
-            target_languages = set()
-            for sid in room_users.get(room_id, set()):
-                if sid in active_users:
-                    target_languages.add(active_users[sid].get('preferred_language', 'en'))
-            
-            if not target_languages:
-                target_languages = {'en'}  # Default
-            
-            # Translate to all target languages
-            translations = loop.run_until_complete(
-                ai_service.translate_for_users(text, source_language, list(target_languages))
-            )
-            
-            loop.close()
-            
-            # Prepare message data
-            message_data = {
-                'user_id': user_id,
-                'username': username,
-                'room_id': room_id,
-                'original_text': text,
-                'is_flagged': moderation_result['is_flagged'],
-                'toxicity_score': moderation_result['toxicity_score'],
-                'translations': translations
-            }
-            
-            # Save to database
-            saved_message = db.save_message(message_data)
-            
-            # Prepare response
-            response = {
-                'message_id': saved_message['message_id'],
-                'user_id': user_id,
-                'username': username,
-                'room_id': room_id,
-                'original_text': text,
-                'timestamp': saved_message['timestamp'].isoformat(),
-                'is_flagged': moderation_result['is_flagged'],
-                'toxicity_score': moderation_result['toxicity_score'],
-                'flagged_categories': moderation_result.get('flagged_categories', []),
-                'translations': translations,
-                'source_language': source_language
-            }
-            
-            # Broadcast to all users in the room
-            emit('receive_message', response, room=room_id)
-            
-            logger.info(f"Message sent by {username} in room {room_id}")
-            
-        except Exception as e:
-            logger.error(f"Send message error: {e}")
-            emit('error', {'message': 'Failed to send message'})
-    
-    @socketio.on('user_typing')
-    def handle_user_typing(data):
-        """Handle typing indicator"""
-        try:
-            socket_id = request.sid
-            
-            if socket_id not in active_users:
-                return
-            
-            user_info = active_users[socket_id]
-            room_id = data.get('room_id', 'general')
-            is_typing = data.get('is_typing', False)
-            
-            # Verify user is in the room
-            if room_id not in user_info.get('rooms', []):
-                return
-            
-            # Broadcast typing status to others in the room
-            emit('user_typing', {
-                'username': user_info['username'],
-                'room_id': room_id,
-                'is_typing': is_typing
-            }, room=room_id, include_self=False)
-            
-        except Exception as e:
-            logger.error(f"Typing indicator error: {e}")
 
+    except Exception as e:
+        logger.error(f"Leave room error: {e}")
+        await transport.emit('error', {'message': 'Failed to leave room'})
+
+@profiled('socket')
+async def handle_send_message(transport, data):
+    """Handle sending a message"""
+    try:
+        socket_id = transport.sid
+
+        session = session_store.get(socket_id)
+        if session is None:
+            await transport.emit('error', {'message': 'Not authenticated. Please join a room first.'})
+            return
+
+        user_id = session.user_id
+        username = session.username
+        room_id = data.get('room_id', 'general')
+        text = data.get('text', '').strip()
+
+        if not text:
+            await transport.emit('error', {'message': 'Message text cannot be empty'})
+            return
+
+        # Check rate limit
+        allowed, message = rate_limiter.is_allowed(user_id)
+        if not allowed:
+            await transport.emit('error', {'message': message})
+            return
+
+        # Verify user is in the room
+        room_id = _joined_room_id(session, room_id)
+        if room_id is None:
+            await transport.emit('error', {'message': 'You are not in this room'})
+            return
+
+        # Detect language and moderate content
+        source_language, moderation_result = await asyncio.gather(
+            ai_service.detect_language(text),
+            ai_service.moderate_content(text)
+        )
+
+        # Get all users in the room and their preferred languages
+        target_languages = session_store.room_languages(room_id)
+
+        if not target_languages:
+            target_languages = {'en'}  # Default
+
+        # Translate to all target languages
+        translations = await ai_service.translate_for_users(text, source_language, list(target_languages))
+
+        # Prepare message data
+        message_data = {
+            'user_id': user_id,
+            'username': username,
+            'room_id': room_id,
+            'original_text': text,
+            'is_flagged': moderation_result['is_flagged'],
+            'toxicity_score': moderation_result['toxicity_score'],
+            'translations': translations
+        }
+
+        # Save to database
+        saved_message = await adb.save_message(message_data)
+
+        # Prepare response
+        response = {
+            'message_id': saved_message['message_id'],
+            'user_id': user_id,
+            'username': username,
+            'room_id': room_id,
+            'original_text': text,
+            'timestamp': saved_message['timestamp'].isoformat(),
+            'is_flagged': moderation_result['is_flagged'],
+            'toxicity_score': moderation_result['toxicity_score'],
+            'flagged_categories': moderation_result.get('flagged_categories', []),
+            'translations': translations,
+            'source_language': source_language
+        }
+
+        # Remember for reconnecting clients and search, then broadcast to all users in the room
+        message_log.append(room_id, response)
+        search_index.add(response)
+        await transport.emit('receive_message', outbound_message(response), room=room_id)
+
+        logger.info(f"Message sent by {username} in room {room_id}")
+
+    except Exception as e:
+        logger.error(f"Send message error: {e}")
+        await transport.emit('error', {'message': 'Failed to send message'})
+
+@profiled('socket')
+async def handle_user_typing(transport, data):
+    """Handle typing indicator"""
+    try:
+        socket_id = transport.sid
+
+        session = session_store.get(socket_id)
+        if session is None:
+            return
+
+        room_id = data.get('room_id', 'general')
+        is_typing = data.get('is_typing', False)
+
+        # Verify user is in the room
+        room_id = _joined_room_id(session, room_id)
+        if room_id is None:
+            return
+
+        # Broadcast typing status to others in the room
+        await transport.emit('user_typing', {
+            'username': session.username,
+            'room_id': room_id,
+            'is_typing': is_typing
+        }, room=room_id, include_self=False)
+
+    except Exception as e:
+        logger.error(f"Typing indicator error: {e}")
+
+# Event name -> handler, shared by the eventlet and asyncio servers
+EVENT_HANDLERS = {
+    'connect': handle_connect,
+    'disconnect': handle_disconnect,
+    'join_room': handle_join_room,
+    'resume': handle_resume,
+    'leave_room': handle_leave_room,
+    'send_message': handle_send_message,
+    'user_typing': handle_user_typing,
+}
+
+def start_backpressure_sweep(socketio):
+    """Periodically deliver held-back events to drained sockets (eventlet mode)"""
+    def run():
+        while True:
+            socketio.sleep(Config.OUTBOUND_SWEEP_INTERVAL)
+            try:
+                for sid, event, data in backpressure.sweep(socketio.server):
+                    socketio.emit(event, data, to=sid)
+            except Exception as e:
+                logger.error(f"Backpressure sweep failed: {e}")
+    if backpressure.enabled() and Config.OUTBOUND_SWEEP_INTERVAL > 0:
+        socketio.start_background_task(run)
+
+def start_async_backpressure_sweep(sio):
+    """Periodically deliver held-back events to drained sockets (asyncio mode; needs a running loop)"""
+    async def run():
+        while True:
+            await sio.sleep(Config.OUTBOUND_SWEEP_INTERVAL)
+            try:
+                for sid, event, data in backpressure.sweep(sio):
+                    await sio.emit(event, data, to=sid)
+            except Exception as e:
+                logger.error(f"Backpressure sweep failed: {e}")
+    if backpressure.enabled() and Config.OUTBOUND_SWEEP_INTERVAL > 0:
+        sio.start_background_task(run)
+
+def register_socket_handlers(socketio):
+    """Register all Socket.IO event handlers on a Flask-SocketIO server (eventlet mode)"""
+
+    def make_handler(handler):
+        def on_event(*args):
+            return run_async(handler(SocketTransport(socketio, request.sid), *args))
+        return on_event
+
+    for event, handler in EVENT_HANDLERS.items():
+        socketio.on_event(event, make_handler(handler))
+
+    # Rooms merged when the local store is replayed (called from the database connector thread)
+    adb.database.on_rooms_merged = lambda moved: run_async(
+        move_merged_rooms(moved, lambda sid: SocketTransport(socketio, sid))
+    )
+
+def register_async_socket_handlers(sio):
+    """Register all Socket.IO event handlers on a python-socketio AsyncServer (asyncio mode)"""
+
+    def make_handler(event, handler):
+        if event == 'connect':
+            async def on_connect(sid, environ, auth=None):
+                return await handler(AsyncSocketTransport(sio, sid), auth)
+            return on_connect
+
+        async def on_event(sid, *args):
+            return await handler(AsyncSocketTransport(sio, sid), *args)
+        return on_event
+
+    for event, handler in EVENT_HANDLERS.items():
+        sio.on(event, make_handler(event, handler))
+
+def watch_room_merges(sio):
+    """Move live state to merged rooms after a local store replay (asyncio mode; needs a running loop)"""
+    loop = asyncio.get_running_loop()
+
+    def on_rooms_merged(moved):
+        # Called from the database connector thread: run on the server's loop and wait
+        future = asyncio.run_coroutine_threadsafe(
+            move_merged_rooms(moved, lambda sid: AsyncSocketTransport(sio, sid)), loop
+        )
+        future.result()
+
+    adb.database.on_rooms_merged = on_rooms_merged
@@ -0,0 +1,62 @@
+"""Startup timing and health (liveness/readiness) reporting.
+
+Import this module first in a server entry point: marks are recorded in
+milliseconds since it was imported.
+"""
+import logging
+import threading
+import time
+from typing import Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+_started = time.perf_counter()
+_marks = {}  # name -> ms since startup
+_lock = threading.Lock()
+
+def mark(name: str) -> bool:
+    """Record the first time a startup milestone is reached; returns True if newly recorded"""
+    with _lock:
+        if name in _marks:
+            return False
+        _marks[name] = round((time.perf_counter() - _started) * 1000, 1)
+    logger.info(f"Startup: {name} after {_marks[name]} ms")
+    return True
+
+def report() -> Dict[str, float]:
+    """Startup milestones in milliseconds since the process started importing the app"""
+    with _lock:
+        return dict(_marks)
+
+def database_ready():
+    """Called when the first database connection attempt finishes (and on reconnect)"""
+    from database import db
+    db.ensure_default_room()
+    mark('db_ready')
+
+async def health() -> Tuple[Dict, int]:
+    """Combined health summary (always 200 while the process is up)"""
+    from database import db
+    return {
+        'status': 'healthy',
+        'service': 'realtime-chat-backend',
+        'ready': db.ready,
+        'database': db.status
+    }, 200
+
+async def liveness() -> Tuple[Dict, int]:
+    """Liveness: the process is up and serving requests"""
+    return {'status': 'alive', 'service': 'realtime-chat-backend'}, 200
+
+async def readiness() -> Tuple[Dict, int]:
+    """Readiness: storage is usable (MongoDB connected, or the local fallback after the first attempt)"""
+    from database import db
+    body = {
+        'status': 'ready' if db.ready else 'starting',
+        'service': 'realtime-chat-backend',
+        'database': db.status,
+        'startup_ms': report()
+    }
+    if db.last_error:
+        body['database_error'] = db.last_error
+    return body, 200 if db.ready else 503
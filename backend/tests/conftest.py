@@ -0,0 +1,8 @@
+"""Run the backend modules from the parent folder without MongoDB, OpenAI or a local store file"""
+import os
+import sys
+
+os.environ['LOCAL_STORE_PATH'] = ''
+os.environ['OPENAI_API_KEY'] = ''
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
@@ -0,0 +1,73 @@
+import threading
+import time
+
+import pytest
+
+import ai_service as ai_service_module
+from ai_service import AIService
+from config import Config
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(Config, 'OPENAI_API_KEY', 'sk-test')
+    return AIService()
+
+def wait_for_build(service):
+    with service._client_lock:
+        pass
+
+def test_client_is_never_waited_for(service, monkeypatch):
+    release = threading.Event()
+    built = []
+
+    def slow_build(name):
+        release.wait(5)
+        built.append(name)
+        return object()
+
+    monkeypatch.setattr(service, '_build_client', slow_build)
+    service.warm_up()
+
+    started = time.perf_counter()
+    assert service.async_client is None  # still importing: the message goes without AI
+    assert time.perf_counter() - started < 0.1
+
+    release.set()
+    wait_for_build(service)
+    assert service.async_client is not None
+    assert built == ['AsyncOpenAI', 'OpenAI']
+
+def test_failed_build_is_retried_with_backoff(service, monkeypatch):
+    results = [None, None, object()]
+    calls = []
+
+    def flaky_build(name):
+        calls.append(name)
+        return results.pop(0) if name == 'AsyncOpenAI' else object()
+
+    monkeypatch.setattr(service, '_build_client', flaky_build)
+    service.warm_up()
+    wait_for_build(service)
+    assert service._retry_at - time.monotonic() == pytest.approx(ai_service_module._RETRY_INITIAL, abs=1)
+
+    # Backing off: no new build attempt
+    assert service.async_client is None
+    wait_for_build(service)
+    assert calls == ['AsyncOpenAI']
+
+    service._retry_at = 0
+    assert service.async_client is None
+    wait_for_build(service)
+    assert service._retry_at - time.monotonic() == pytest.approx(ai_service_module._RETRY_INITIAL * 2, abs=1)
+
+    service._retry_at = 0
+    service.warm_up()
+    wait_for_build(service)
+    assert service.async_client is not None
+    assert service._build_failures == 0
+
+def test_no_api_key_never_builds(monkeypatch):
+    monkeypatch.setattr(Config, 'OPENAI_API_KEY', '')
+    service = AIService()
+    monkeypatch.setattr(service, '_build_client', lambda name: pytest.fail('built without a key'))
+    assert service.async_client is None
@@ -0,0 +1,117 @@
+"""Slow sockets skip room messages and resync via resume; nothing but resync notices and typing/presence is held back"""
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from backpressure import Backpressure
+from config import Config
+from local_store import LocalStore
+from message_log import MessageLog
+
+class FakeQueue:
+    def __init__(self):
+        self.depth = 0
+
+    def qsize(self):
+        return self.depth
+
+class FakeServer:
+    """Just enough of a Socket.IO server for Backpressure: room participants and Engine.IO queues"""
+
+    def __init__(self, sids):
+        self.eio_sids = {sid: f'eio-{sid}' for sid in sids}
+        self.queues = {sid: FakeQueue() for sid in sids}
+        self.eio = SimpleNamespace(sockets={
+            self.eio_sids[sid]: SimpleNamespace(queue=self.queues[sid]) for sid in sids
+        })
+        self.manager = SimpleNamespace(
+            get_participants=lambda namespace, room: list(self.eio_sids.items()),
+            eio_sid_from_sid=lambda sid, namespace: self.eio_sids.get(sid)
+        )
+
+    def disconnect(self, sid):
+        del self.eio.sockets[self.eio_sids.pop(sid)]
+
+def message(room_id, number, start=datetime(2026, 1, 1)):
+    return {'message_id': f'm{number}', 'room_id': room_id, 'original_text': f'message {number}',
+            'timestamp': start + timedelta(seconds=number), 'translations': {}}
+
+@pytest.fixture
+def server():
+    return FakeServer(['slow', 'fast'])
+
+@pytest.fixture
+def backpressure(monkeypatch):
+    monkeypatch.setattr(Config, 'OUTBOUND_SOFT_LIMIT', 4)
+    monkeypatch.setattr(Config, 'OUTBOUND_HARD_LIMIT', 8)
+    monkeypatch.setattr(Config, 'SLOW_CONSUMER_TIMEOUT', 3600)
+    return Backpressure()
+
+def broadcast(backpressure, server, log, room_id, number):
+    """What handle_send_message does: log the message, then plan the room emit"""
+    payload = message(room_id, number)
+    log.append(room_id, payload)
+    return backpressure.plan(server, 'receive_message', payload, room_id)
+
+def test_skipped_messages_are_never_delivered_later(backpressure, server):
+    log = MessageLog(100)
+    broadcast(backpressure, server, log, 'room', 1)
+    server.queues['slow'].depth = 10
+
+    for number in (2, 3, 4):
+        plan = broadcast(backpressure, server, log, 'room', number)
+        assert plan.skip == ['slow']
+        assert plan.deliveries == []
+    backpressure.plan(server, 'user_typing', {'username': 'ann', 'room_id': 'room'}, 'room')
+    backpressure.plan(server, 'user_typing', {'username': 'ann', 'room_id': 'room', 'typing': False}, 'room')
+
+    server.queues['slow'].depth = 0
+    deliveries = backpressure.sweep(server)
+
+    # The resync notice comes first, then only the latest typing state; no messages
+    assert deliveries == [
+        ('slow', 'resync_required', {'room_id': 'room'}),
+        ('slow', 'user_typing', {'username': 'ann', 'room_id': 'room', 'typing': False}),
+    ]
+    # The client resumes from the last message it saw and gets the skipped ones, oldest first
+    assert [missed['message_id'] for missed in log.since('room', 'm1')] == ['m2', 'm3', 'm4']
+    # Once resynced, the socket is live again and is not asked twice
+    assert backpressure.sweep(server) == []
+    assert broadcast(backpressure, server, log, 'room', 5).deliveries == []
+
+def test_resync_precedes_the_next_live_message(backpressure, server):
+    log = MessageLog(100)
+    server.queues['slow'].depth = 10
+    broadcast(backpressure, server, log, 'room', 1)
+
+    # Drained before the sweep ran: the next room emit sends the notice ahead of the message
+    server.queues['slow'].depth = 0
+    plan = broadcast(backpressure, server, log, 'room', 2)
+    assert plan.deliveries == [('slow', 'resync_required', {'room_id': 'room'})]
+    assert 'slow' not in plan.skip
+    assert backpressure.sweep(server) == []
+
+def test_sweep_waits_for_soft_limit_and_forgets_gone_sockets(backpressure, server):
+    log = MessageLog(100)
+    server.queues['slow'].depth = 10
+    server.queues['fast'].depth = 10
+    broadcast(backpressure, server, log, 'room', 1)
+
+    server.queues['slow'].depth = 5  # below the hard limit but not drained yet
+    server.disconnect('fast')
+    assert backpressure.sweep(server) == []
+    assert set(backpressure.stale) == {'slow'}
+
+    server.queues['slow'].depth = 3
+    assert backpressure.sweep(server) == [('slow', 'resync_required', {'room_id': 'room'})]
+
+def test_resume_range_query_matches_skipped_messages(tmp_path):
+    # When the in-memory log no longer has the last seen message, resume reads the same range from storage
+    store = LocalStore(str(tmp_path / 'store.db'))
+    for number in range(1, 6):
+        store.save_message(message('room', number))
+    store.save_message(message('other', 9))
+
+    assert [missed['message_id'] for missed in store.get_messages_since('room', 'm2')] == ['m3', 'm4', 'm5']
+    assert store.get_messages_since('room', 'unknown') is None
@@ -0,0 +1,100 @@
+import time
+
+import mongomock
+import pytest
+from pymongo.errors import AutoReconnect
+
+from config import Config
+from database import Database, room_id_for
+from local_store import LocalStore
+
+@pytest.fixture
+def mongo():
+    return mongomock.MongoClient()
+
+@pytest.fixture
+def database(tmp_path, mongo):
+    """A Database with a local store, not yet connected to its (mock) MongoDB"""
+    database = Database()
+    database.local = LocalStore(str(tmp_path / 'local.db'))
+    database.client = mongo
+    database.db = mongo['chat']
+    return database
+
+def wait_for(condition, timeout=5.0):
+    """Poll condition until it holds or timeout seconds pass"""
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+def test_default_room_created_while_connecting_matches_mongo(database, mongo, tmp_path):
+    # A previous run created 'general' in MongoDB
+    previous = Database()
+    previous.client, previous.db = mongo, mongo['chat']
+    previous.local = None
+    assert previous.connect(replay=False)
+    previous.ensure_default_room()
+
+    # This run creates it in the local store before its first connect finishes
+    database.ensure_default_room()
+    local_room = database.get_room(room_name='general')
+    assert database.connect()
+
+    mongo_room = database.get_room(room_name='general')
+    assert local_room['room_id'] == mongo_room['room_id'] == room_id_for('general')
+    assert mongo['chat'].rooms.count_documents({'room_name': 'general'}) == 1
+
+def test_replay_merges_local_room_into_existing_mongo_room(database, mongo):
+    # 'general' was created by an older version with a random id
+    mongo['chat'].rooms.insert_one({'room_id': 'legacy-general', 'room_name': 'general'})
+    merged = []
+    database.on_rooms_merged = merged.append
+
+    local_room = database.get_or_create_room('general')
+    database.save_message({'user_id': 'u1', 'username': 'ann', 'room_id': local_room['room_id'], 'original_text': 'during outage'})
+    assert database.connect()
+
+    assert merged == [{local_room['room_id']: 'legacy-general'}]
+    assert database.canonical_room_id(local_room['room_id']) == 'legacy-general'
+    assert [m['original_text'] for m in mongo['chat'].messages.find({'room_id': 'legacy-general'})] == ['during outage']
+    assert mongo['chat'].rooms.count_documents({'room_name': 'general'}) == 1
+
+    # Clients still holding the local id reach the MongoDB room, and new messages are stored under it
+    assert database.get_room(room_id=local_room['room_id'])['room_id'] == 'legacy-general'
+    saved = database.save_message({'user_id': 'u1', 'username': 'ann', 'room_id': local_room['room_id'], 'original_text': 'after'})
+    assert saved['room_id'] == 'legacy-general'
+    assert [m['original_text'] for m in database.get_messages('legacy-general')] == ['during outage', 'after']
+
+    # The local store was moved to the MongoDB id too, so a later outage uses the same room
+    assert database.local.get_room(room_name='general')['room_id'] == 'legacy-general'
+    assert [m['room_id'] for m in database.local.get_messages('legacy-general')] == ['legacy-general']
+
+def test_connection_lost_mid_run_falls_back_and_replays_on_reconnect(database, mongo, monkeypatch):
+    monkeypatch.setattr(Config, 'DB_RECONNECT_INTERVAL', 0.05)
+    ready = []
+    database.connect_in_background(on_ready=lambda: ready.append(database.status))
+    assert wait_for(lambda: ready == ['connected'])
+    room = database.get_or_create_room('general')
+    database.save_message({'user_id': 'u1', 'username': 'ann', 'room_id': room['room_id'], 'original_text': 'before'})
+
+    def down(*args, **kwargs):
+        raise AutoReconnect('connection refused')
+
+    with monkeypatch.context() as outage:
+        for name in ('insert_one', 'find', 'find_one', 'bulk_write'):
+            outage.setattr(mongomock.Collection, name, down)
+        outage.setattr(mongomock.Database, 'command', down)
+
+        # The failed write lands in the local store, and reads follow it there
+        database.save_message({'user_id': 'u1', 'username': 'ann', 'room_id': room['room_id'], 'original_text': 'during outage'})
+        assert not database.connected and database.status == 'unavailable'
+        assert [m['original_text'] for m in database.get_messages(room['room_id'])] == ['during outage']
+        time.sleep(0.2)  # the connector keeps retrying while MongoDB is down
+        assert not database.connected and ready == ['connected']
+
+    # MongoDB is back: the connector reconnects on its own and replays the outage writes
+    assert wait_for(lambda: ready == ['connected', 'connected'])
+    assert sorted(m['original_text'] for m in mongo['chat'].messages.find()) == ['before', 'during outage']
+    assert database.local.pending_replay('messages', 10) == []
+    assert sorted(m['original_text'] for m in database.get_messages(room['room_id'])) == ['before', 'during outage']
@@ -0,0 +1,32 @@
+import pytest
+
+from preprocessor import Preprocessor
+
+@pytest.fixture
+def preprocessor():
+    return Preprocessor()
+
+@pytest.mark.parametrize('text, url', [
+    ('see https://x.io/a.', 'https://x.io/a'),
+    ('(https://x.io)', 'https://x.io'),
+    ('links: https://x.io/a, https://x.io/b; done', 'https://x.io/a'),
+    ('really? https://x.io/?q=1!', 'https://x.io/?q=1'),
+    ('"https://x.io/quoted"', 'https://x.io/quoted'),
+    ('[docs](https://x.io/docs)]', 'https://x.io/docs'),
+    ('https://en.wikipedia.org/wiki/Python_(language).', 'https://en.wikipedia.org/wiki/Python_(language)'),
+    ('go to www.example.com/page.html.', 'www.example.com/page.html'),
+])
+def test_url_excludes_trailing_punctuation(preprocessor, text, url):
+    urls = [span.text for span in preprocessor.tokenize(text) if span.kind == 'url']
+    assert urls[0] == url
+
+def test_mask_keeps_punctuation_outside_placeholder(preprocessor):
+    masked, preserved = preprocessor.mask('see https://x.io/a. (https://x.io)')
+    assert masked == 'see [[0]]. ([[1]])'
+    assert preserved == ['https://x.io/a', 'https://x.io']
+    assert preprocessor.unmask('mira [[0]]. ([[1]])', preserved) == 'mira https://x.io/a. (https://x.io)'
+
+def test_moderation_checks_letters_in_protected_spans(preprocessor):
+    assert preprocessor.needs_moderation('`idiot`')
+    assert not preprocessor.is_translatable('https://x.io 42')
+    assert not preprocessor.needs_moderation('42 :) 🎉')
@@ -0,0 +1,47 @@
+from session_store import SessionStore
+
+def test_attach_moves_socket_to_new_user():
+    store = SessionStore(token_limit=10)
+    store.register_token('token-b', 'user-b')
+    store.attach('sid1', 'user-a', 'alice', 'es', token='token-a')
+    store.attach('sid2', 'user-a', 'alice')
+    store.join('sid1', 'room')
+
+    session = store.attach('sid1', store.user_for_token('token-b'), 'bob', token='token-b')
+
+    assert session.user_id == 'user-b'
+    assert session.username == 'bob'
+    assert session.token == 'token-b'
+    assert session.preferred_language == 'es'
+    assert store.sockets_for_user('user-a') == {'sid2'}
+    assert store.sockets_for_user('user-b') == {'sid1'}
+    assert store.user_in_room('user-b', 'room')
+    assert not store.user_in_room('user-a', 'room')
+
+def test_attach_moving_last_socket_drops_old_user():
+    store = SessionStore(token_limit=10)
+    store.attach('sid1', 'user-a', 'alice', token='token-a')
+    session = store.attach('sid1', 'user-b', 'bob')
+
+    assert 'user-a' not in store.user_sockets
+    assert session.token is None
+    assert store.stats()['users'] == 1
+
+def test_attach_same_user_keeps_session():
+    store = SessionStore(token_limit=10)
+    first = store.attach('sid1', 'user-a', 'alice', 'en')
+    again = store.attach('sid1', 'user-a', 'alice', 'fr', token='token-a')
+
+    assert again is first
+    assert again.preferred_language == 'fr'
+    assert again.token == 'token-a'
+    assert store.sockets_for_user('user-a') == {'sid1'}
+
+def test_remove_cleans_indexes():
+    store = SessionStore(token_limit=10)
+    store.attach('sid1', 'user-a', 'alice')
+    store.join('sid1', 'room')
+    store.remove('sid1')
+
+    assert store.stats() == {'sockets': 0, 'users': 0, 'multi_socket_users': 0, 'rooms': 0,
+                             'memberships': 0, 'authenticated_sockets': 0, 'tokens': 0}
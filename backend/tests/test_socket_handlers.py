@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from message_log import message_log
+from session_store import session_store
+import socket_handlers
+
+class FakeTransport:
+    """Records Socket.IO room changes for one socket"""
+
+    def __init__(self, sid, calls):
+        self.sid = sid
+        self.calls = calls
+
+    async def join(self, room_id):
+        self.calls.append((self.sid, 'join', room_id))
+
+    async def leave(self, room_id):
+        self.calls.append((self.sid, 'leave', room_id))
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    yield
+    for sid in list(session_store.sessions):
+        session_store.remove(sid)
+    message_log._rooms.clear()
+    socket_handlers.pending_leaves.clear()
+
+def test_move_merged_rooms_moves_live_state():
+    session_store.attach('sid1', 'user-a', 'ann')
+    session_store.join('sid1', 'local-general')
+    session_store.attach('sid2', 'user-b', 'bob')
+    session_store.join('sid2', 'local-general')
+    session_store.join('sid2', 'other')
+    message_log.append('local-general', {'message_id': 'm1', 'room_id': 'local-general', 'timestamp': '2026-01-01T00:00:01'})
+    message_log.append('mongo-general', {'message_id': 'm0', 'room_id': 'mongo-general', 'timestamp': '2026-01-01T00:00:00'})
+    socket_handlers.pending_leaves[('user-c', 'local-general')] = 'token'
+    calls = []
+
+    asyncio.run(socket_handlers.move_merged_rooms(
+        {'local-general': 'mongo-general'}, lambda sid: FakeTransport(sid, calls)
+    ))
+
+    assert session_store.get('sid1').rooms == {'mongo-general'}
+    assert session_store.get('sid2').rooms == {'mongo-general', 'other'}
+    assert session_store.room_members == {'mongo-general': {'sid1', 'sid2'}, 'other': {'sid2'}}
+    assert sorted(calls) == [
+        ('sid1', 'join', 'mongo-general'), ('sid1', 'leave', 'local-general'),
+        ('sid2', 'join', 'mongo-general'), ('sid2', 'leave', 'local-general'),
+    ]
+    assert [m['message_id'] for m in message_log.since('mongo-general', 'm0')] == ['m1']
+    assert message_log.since('mongo-general', 'm0')[0]['room_id'] == 'mongo-general'
+    assert socket_handlers.pending_leaves == {('user-c', 'mongo-general'): 'token'}
+
+def test_joined_room_id_accepts_merged_local_id(monkeypatch):
+    monkeypatch.setattr(socket_handlers.adb.database, 'room_aliases', {'local-general': 'mongo-general'})
+    session = session_store.attach('sid1', 'user-a', 'ann')
+    session_store.join('sid1', 'mongo-general')
+
+    assert socket_handlers._joined_room_id(session, 'local-general') == 'mongo-general'
+    assert socket_handlers._joined_room_id(session, 'mongo-general') == 'mongo-general'
+    assert socket_handlers._joined_room_id(session, 'elsewhere') is None
@@ -0,0 +1,30 @@
+import pytest
+
+from translation_memory import join_segments, split_segments
+
+@pytest.mark.parametrize('text', [
+    'Mr. Smith is here.',
+    'Ask Dr. Jones and Mrs. Lee tomorrow.',
+    'Bring fruit, e.g. apples or pears.',
+    'That is i.e. the point.',
+    'She moved to the U.S. last year.',
+    'The letter was signed by J. R. Tolkien himself.',
+    'Cats vs. dogs, again.',
+    'Meet at approx. noon (e.g. after lunch).',
+])
+def test_abbreviations_do_not_split(text):
+    segments, separators = split_segments(text)
+    assert segments == [text]
+    assert separators == []
+
+@pytest.mark.parametrize('text, expected', [
+    ('I like it. Then we left.', ['I like it.', 'Then we left.']),
+    ('Hello Mr. Smith. How are you?', ['Hello Mr. Smith.', 'How are you?']),
+    ('Wait! Really? Yes.', ['Wait!', 'Really?', 'Yes.']),
+    ('Version 2. Next item.', ['Version 2.', 'Next item.']),
+    ('好的。谢谢！再见', ['好的。', '谢谢！', '再见']),
+])
+def test_sentences_split(text, expected):
+    segments, separators = split_segments(text)
+    assert segments == expected
+    assert join_segments(segments, separators) == text
@@ -0,0 +1,112 @@
+import hashlib
+import logging
+import re
+import threading
+from typing import Dict, List, Tuple
+from config import Config
+from cache import LRUCache
+from async_database import adb
+
+logger = logging.getLogger(__name__)
+
+# Sentence boundary: terminal punctuation followed by whitespace, or CJK
+# full-width terminal punctuation (which is not followed by a space)
+_SENTENCE_BOUNDARY_RE = re.compile(r'(?<=[.!?…])\s+|(?<=[。！？])\s*')
+
+# A period that ends an initial or abbreviation ("J.", "e.g.", "U.S.", "Mr.")
+# rather than a sentence
+_ABBREVIATION_RE = re.compile(
+    r'(?<![^\s(\["\'])(?:[A-Za-z](?:\.[A-Za-z])*'
+    r'|mr|mrs|ms|dr|prof|sr|jr|st|mt|vs|etc|approx|dept|fig|inc|ltd|corp)\.\Z',
+    re.IGNORECASE
+)
+
+def split_segments(text: str) -> Tuple[List[str], List[str]]:
+    """Split text into sentence segments and the separators between them"""
+    segments = []
+    separators = []
+    pos = 0
+    for match in _SENTENCE_BOUNDARY_RE.finditer(text):
+        if match.end() >= len(text) or match.start() == pos:
+            continue
+        if text[match.start() - 1] == '.' and _ABBREVIATION_RE.search(text, max(pos, match.start() - 8), match.start()):
+            continue
+        segments.append(text[pos:match.start()])
+        separators.append(match.group())
+        pos = match.end()
+    segments.append(text[pos:])
+    return segments, separators
+
+def join_segments(segments: List[str], separators: List[str]) -> str:
+    """Reassemble segments with their original separators"""
+    parts = []
+    for i, segment in enumerate(segments):
+        parts.append(segment)
+        if i < len(separators):
+            parts.append(separators[i])
+    return ''.join(parts)
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (about four characters per token)"""
+    return max(1, len(text) // 4) if text else 0
+
+class TranslationMemory:
+    """Sentence-segment translation memory (memory LRU + MongoDB translation cache)"""
+
+    def __init__(self, persistent: bool = True):
+        self.memory = LRUCache(Config.TRANSLATION_MEMORY_SIZE)
+        self.persistent = persistent
+        self._lock = threading.Lock()
+        self.segments_looked_up = 0
+        self.segments_hit = 0
+        self.tokens_saved = 0
+
+    @staticmethod
+    def _key(segment: str, source_lang: str, target_lang: str) -> str:
+        """Memory key for a segment and language pair"""
+        digest = hashlib.sha1(segment.encode('utf-8')).hexdigest()
+        return f"{source_lang}:{target_lang}:{digest}"
+
+    async def lookup(self, segments: List[str], source_lang: str, target_lang: str) -> Dict[str, str]:
+        """Find stored translations for segments; returns segment -> translation"""
+        unique = list(dict.fromkeys(s for s in segments if s.strip()))
+        found = {}
+        missing = []
+        for segment in unique:
+            translated = self.memory.get(self._key(segment, source_lang, target_lang))
+            if translated is not None:
+                found[segment] = translated
+            else:
+                missing.append(segment)
+
+        if missing and self.persistent:
+            stored = await adb.get_cached_translations(missing, source_lang, target_lang)
+            for segment, translated in stored.items():
+                found[segment] = translated
+                self.memory.set(self._key(segment, source_lang, target_lang), translated)
+
+        with self._lock:
+            self.segments_looked_up += len(unique)
+            self.segments_hit += len(found)
+            self.tokens_saved += sum(estimate_tokens(s) for s in found)
+        return found
+
+    async def store(self, translations: Dict[str, str], source_lang: str, target_lang: str):
+        """Remember segment translations"""
+        for segment, translated in translations.items():
+            self.memory.set(self._key(segment, source_lang, target_lang), translated)
+        if self.persistent and translations:
+            await adb.cache_translations(translations, source_lang, target_lang)
+
+    def stats(self) -> Dict:
+        """Segment hit-rate and token savings statistics"""
+        return {
+            'memory': self.memory.stats(),
+            'segments_looked_up': self.segments_looked_up,
+            'segments_hit': self.segments_hit,
+            'hit_rate': round(self.segments_hit / self.segments_looked_up, 4) if self.segments_looked_up else 0.0,
+            'estimated_tokens_saved': self.tokens_saved
+        }
+
+# Global translation memory instance
+translation_memory = TranslationMemory()
@@ -1,5 +1,7 @@
 import secrets
 import logging
+import asyncio
+import threading
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
@@ -29,3 +31,24 @@ def validate_room_name(room_name: str) -> bool:
         return False
     return True
 
+
+_loop = None
+_loop_lock = threading.Lock()
+
+def _shared_loop():
+    """Event loop shared by all run_async callers, running in its own (green) thread"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name='asyncio-loop', daemon=True).start()
+            _loop = loop
+    return _loop
+
+def run_async(coro):
+    """Run a coroutine to completion from synchronous code (eventlet mode).
+
+    Every coroutine runs on one shared loop: greenlets share an OS thread, so
+    each starting its own loop fails as soon as two handlers overlap.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _shared_loop()).result()
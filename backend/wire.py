@@ -0,0 +1,89 @@
+from datetime import datetime, timezone
+import logging
+from typing import Dict
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Wire formats: 'json' (default, full field names), 'compact' (short field
+# codes and epoch-millisecond timestamps over JSON), 'msgpack' (compact
+# payloads with the MessagePack Socket.IO serializer)
+WIRE_FORMATS = ('json', 'compact', 'msgpack')
+
+# Field name -> short code for receive_message payloads; keep in sync with
+# frontend/src/utils/socket.js
+FIELD_CODES = {
+    'message_id': 'i',
+    'user_id': 'u',
+    'username': 'n',
+    'room_id': 'r',
+    'original_text': 't',
+    'timestamp': 'ts',
+    'is_flagged': 'f',
+    'toxicity_score': 's',
+    'flagged_categories': 'c',
+    'translations': 'tr',
+    'source_language': 'l',
+}
+FIELD_NAMES = {code: name for name, code in FIELD_CODES.items()}
+
+def wire_format() -> str:
+    """Configured wire format (falls back to 'json' when unknown)"""
+    if Config.WIRE_FORMAT not in WIRE_FORMATS:
+        logger.warning(f"Unknown WIRE_FORMAT {Config.WIRE_FORMAT!r}, using 'json'")
+        return 'json'
+    return Config.WIRE_FORMAT
+
+def socketio_options() -> Dict:
+    """Serializer and compression options for the Socket.IO server"""
+    options = {
+        'http_compression': True,
+        'compression_threshold': Config.COMPRESSION_THRESHOLD
+    }
+    if wire_format() == 'msgpack':
+        options['serializer'] = 'msgpack'
+    return options
+
+def to_epoch_ms(timestamp) -> int:
+    """Convert a naive UTC datetime or ISO string to epoch milliseconds"""
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return int(timestamp.timestamp() * 1000)
+
+def encode_message(message: Dict) -> Dict:
+    """Compact a receive_message payload: short keys, epoch-ms timestamp, no redundant values"""
+    compact = {}
+    original_text = message.get('original_text')
+    for name, value in message.items():
+        if name == 'timestamp' and value is not None:
+            value = to_epoch_ms(value)
+        elif name == 'toxicity_score':
+            value = round(value, 4)
+        elif name == 'flagged_categories' and not value:
+            continue
+        elif name == 'translations':
+            # Translations identical to the original text are sent as null
+            value = {lang: (None if text == original_text else text) for lang, text in value.items()}
+        compact[FIELD_CODES.get(name, name)] = value
+    return compact
+
+def decode_message(compact: Dict) -> Dict:
+    """Expand a compact receive_message payload back to full field names"""
+    message = {FIELD_NAMES.get(code, code): value for code, value in compact.items()}
+    message.setdefault('flagged_categories', [])
+    if 'timestamp' in message:
+        message['timestamp'] = datetime.fromtimestamp(message['timestamp'] / 1000, tz=timezone.utc).isoformat()
+    if 'translations' in message:
+        message['translations'] = {
+            lang: (message.get('original_text') if text is None else text)
+            for lang, text in message['translations'].items()
+        }
+    return message
+
+def outbound_message(message: Dict) -> Dict:
+    """receive_message payload in the configured wire format"""
+    if wire_format() == 'json':
+        return message
+    return encode_message(message)
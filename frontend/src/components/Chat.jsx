@@ -1,6 +1,6 @@
 import { useState, useEffect, useCallback, useRef } from 'react';
 import { useUser } from '../contexts/UserContext';
-import { initSocket, disconnectSocket } from '../utils/socket';
+import { initSocket, disconnectSocket, decodeMessage } from '../utils/socket';
 import { getMessageHistory } from '../utils/api';
 import { DEFAULT_ROOMS } from '../constants/languages';
 import ChatHeader from './ChatHeader';
@@ -20,6 +20,15 @@ const Chat = () => {
   const [sending, setSending] = useState(false);
   const [toasts, setToasts] = useState([]);
   const socketRef = useRef(null);
+  const roomRef = useRef(currentRoom);
+  const lastSeenRef = useRef({}); // roomId -> last received message_id
+  const hasConnectedRef = useRef(false);
+
+  const rememberLastSeen = (roomId, messageList) => {
+    if (messageList.length > 0) {
+      lastSeenRef.current[roomId] = messageList[messageList.length - 1].message_id;
+    }
+  };
 
   const addToast = useCallback((message, type = 'info', duration = 3000) => {
     const id = Date.now();
@@ -34,19 +43,57 @@ const Chat = () => {
   useEffect(() => {
     if (!user) return;
 
-    const socket = initSocket(user.userId, user.username);
+    const socket = initSocket(user.userId, user.username, user.token);
     socketRef.current = socket;
 
+    // Rejoin and fetch only the messages missed since the last one received
+    const resume = (roomId) => {
+      socket.emit('resume', {
+        user_id: user.userId,
+        username: user.username,
+        preferred_language: user.language,
+        rooms: [{ room_id: roomId, last_message_id: lastSeenRef.current[roomId] }],
+      });
+    };
+
     socket.on('connect', () => {
       console.log('Connected to server');
       addToast('Connected to chat server', 'success');
-      
-      // Join default room
-      socket.emit('join_room', {
-        roomId: currentRoom.id,
-        userId: user.userId,
-        username: user.username,
-      });
+
+      const room = roomRef.current;
+      if (hasConnectedRef.current) {
+        resume(room.id);
+      } else {
+        // Join default room
+        socket.emit('join_room', {
+          roomId: room.id,
+          userId: user.userId,
+          username: user.username,
+        });
+      }
+      hasConnectedRef.current = true;
+    });
+
+    // The server skipped messages while this connection was falling behind
+    socket.on('resync_required', () => {
+      resume(roomRef.current.id);
+    });
+
+    socket.on('resumed', (data) => {
+      const current = roomRef.current.id;
+      data.rooms
+        .filter((room) => (room.room_id === current || room.room_name === current) && room.messages)
+        .forEach((room) => {
+          const missed = room.messages.map(decodeMessage);
+          rememberLastSeen(current, missed);
+          setMessages((prev) => {
+            if (room.reset) {
+              return missed;
+            }
+            const seen = new Set(prev.map((message) => message.message_id));
+            return [...prev, ...missed.filter((message) => !seen.has(message.message_id))];
+          });
+        });
     });
 
     socket.on('disconnect', () => {
@@ -54,7 +101,9 @@ const Chat = () => {
     });
 
     socket.on('receive_message', (message) => {
-      setMessages((prev) => [...prev, message]);
+      const decoded = decodeMessage(message);
+      rememberLastSeen(roomRef.current.id, [decoded]);
+      setMessages((prev) => [...prev, decoded]);
     });
 
     socket.on('user_joined', (data) => {
@@ -107,6 +156,7 @@ const Chat = () => {
     try {
       setLoading(true);
       const history = await getMessageHistory(roomId, 50);
+      rememberLastSeen(roomId, history.messages || []);
       setMessages(history.messages || []);
     } catch (error) {
       console.error('Failed to load message history:', error);
@@ -177,6 +227,7 @@ const Chat = () => {
     }
 
     setCurrentRoom(newRoom);
+    roomRef.current = newRoom;
     setMessages([]);
     setLoading(true);
     loadMessageHistory(newRoom.id);
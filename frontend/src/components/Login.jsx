@@ -28,6 +28,7 @@ const Login = () => {
         userId: response.userId || Date.now().toString(),
         username: username.trim(),
         language,
+        token: response.token,
       });
       navigate('/chat');
     } catch (err) {
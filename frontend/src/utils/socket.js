@@ -1,9 +1,55 @@
 import { io } from 'socket.io-client';
+import msgpackParser from 'socket.io-msgpack-parser';
 import { SOCKET_URL } from '../constants/languages';
 
 let socket = null;
 
-export const initSocket = (userId, username) => {
+// Must match the backend WIRE_FORMAT setting: 'json', 'compact' or 'msgpack'
+const WIRE_FORMAT = import.meta.env.VITE_WIRE_FORMAT || 'json';
+
+// Short field codes used by compact receive_message payloads (see backend/wire.py)
+const FIELD_NAMES = {
+  i: 'message_id',
+  u: 'user_id',
+  n: 'username',
+  r: 'room_id',
+  t: 'original_text',
+  ts: 'timestamp',
+  f: 'is_flagged',
+  s: 'toxicity_score',
+  c: 'flagged_categories',
+  tr: 'translations',
+  l: 'source_language',
+};
+
+export const decodeMessage = (data) => {
+  if (WIRE_FORMAT === 'json') {
+    return data;
+  }
+
+  const message = { flagged_categories: [] };
+  Object.entries(data).forEach(([code, value]) => {
+    message[FIELD_NAMES[code] || code] = value;
+  });
+
+  if (typeof message.timestamp === 'number') {
+    message.timestamp = new Date(message.timestamp).toISOString();
+  }
+
+  // Translations identical to the original text are sent as null
+  if (message.translations) {
+    message.translations = Object.fromEntries(
+      Object.entries(message.translations).map(([lang, text]) => [
+        lang,
+        text ?? message.original_text,
+      ])
+    );
+  }
+
+  return message;
+};
+
+export const initSocket = (userId, username, token) => {
   if (socket?.connected) {
     return socket;
   }
@@ -12,10 +58,12 @@ export const initSocket = (userId, username) => {
     auth: {
       userId,
       username,
+      token,
     },
     reconnection: true,
     reconnectionDelay: 1000,
     reconnectionAttempts: 5,
+    ...(WIRE_FORMAT === 'msgpack' && { parser: msgpackParser }),
   });
 
   return socket;